@@ -1,76 +1,235 @@
 from langchain.prompts import PromptTemplate
-from LlamaInstance import LlamaInstance
-import time
+from agent.LlamaInstance import LlamaInstance
+from agent.llm_gateway import LLMGateway
+from agent.usage_store import InMemoryUsageStore
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+BREAK_INTERVAL_SECONDS = 3600
+PAUSE_EVERY_REQUESTS = 5
+
+# Bump whenever a prompt template changes so cached completions are not reused.
+PROMPT_VERSION = "1"
+
+DESCRIBE_TEMPLATE = PromptTemplate(
+    input_variables=["history"],
+    template="""
+    Résumez cet historique médical en français (<250 mots) en utilisant 'Il' :
+    {history}
+
+    Puis ajoutez :
+    1. **Observation de résilience** (ex: "Malgré [condition], il montre [adaptation positive]")
+    2. **Note d'appréciation pour le clinicien** (ex: "Observer [défi] démontre votre attention au détail")
+
+    Structure :
+    [Résumé]...
+    [Résilience]...
+    [Reconnaissance]...
+    """
+)
+
+RECOMMEND_TEMPLATE = PromptTemplate(
+    input_variables=["situation"],
+    template="""
+    En tant que médecin senior compatissant, analysez ce cas :
+    {situation}
+
+    Fournissez en français :
+    1. Recommandations cliniques (à puces)
+    2. Message de soutien émotionnel à l'équipe de soins
+    3. Citation motivationnelle sur la guérison
+
+    Format :
+    [Conseils médicaux]...
+    [Soutien à l'équipe]...
+    [Citation d'inspiration]...
+    """
+)
+
+SUMMARY_TEMPLATE = PromptTemplate(
+    input_variables=["records"],
+    template="""
+    Rédigez un résumé clinique factuel et concis en français (<250 mots) de ces dossiers médicaux,
+    en conservant diagnostics, traitements, allergies, antécédents et dates importantes :
+    {records}
+    """
+)
+
+MERGE_TEMPLATE = PromptTemplate(
+    input_variables=["summaries"],
+    template="""
+    Fusionnez ces résumés cliniques partiels d'un même patient, dans l'ordre chronologique,
+    en un seul résumé factuel en français (<250 mots), sans perdre d'information clinique importante :
+    {summaries}
+    """
+)
+
+UPDATE_TEMPLATE = PromptTemplate(
+    input_variables=["summary", "records"],
+    template="""
+    Voici le résumé clinique actuel d'un patient :
+    {summary}
+
+    Mettez-le à jour en français (<250 mots) avec ces nouveaux dossiers médicaux, plus récents :
+    {records}
+    """
+)
+
+def estimate_tokens(text: str) -> int:
+    """Cheap upper-bound estimate (~4 characters per token) used to keep prompts inside the context window."""
+    return len(text) // 4 + 1
 
 class ClinicalAssistantAgent:
-    def __init__(self):
-        self.llm = LlamaInstance()
-        self.usage_count = 0
-        self.last_break_time = time.time()
+    def __init__(self, cache=None, llm=None, max_concurrency: int = 8, chunk_tokens: int = 3000, usage=None,
+                 observe=None):
+        self.llm = llm if llm is not None else LlamaInstance()
+        self.gateway = LLMGateway(self.llm, max_concurrency, observe=observe)
+        self.cache = cache
+        self.chunk_tokens = chunk_tokens
+        self.usage = usage if usage is not None else InMemoryUsageStore()
+
+    def _model_params(self) -> dict:
+        return {
+            "model": getattr(self.llm, "model_name", None),
+            "temperature": getattr(self.llm, "temperature", None),
+            "max_tokens": getattr(self.llm, "max_tokens", None),
+        }
+
+    async def _cached(self, kind: str, payload, prompt: str, cache_tag: str = None) -> str:
+        if self.cache is None:
+            return await self.gateway.invoke(prompt)
+        key = self.cache.make_key(kind, payload, PROMPT_VERSION, self._model_params())
+        result = await self.cache.aget(key)
+        if result is None:
+            result = await self.gateway.invoke(prompt)
+            await self.cache.aset(key, result, tags=[cache_tag] if cache_tag else ())
+        return result
+
+    async def _stream_cached(self, kind: str, payload, prompt: str, cache_tag: str = None):
+        """Yield completion tokens as the model produces them; a cache hit is yielded in one piece."""
+        key = None
+        if self.cache is not None:
+            key = self.cache.make_key(kind, payload, PROMPT_VERSION, self._model_params())
+            cached = await self.cache.aget(key)
+            if cached is not None:
+                yield cached
+                return
+        parts = []
+        async for token in self.gateway.stream(prompt):
+            parts.append(token)
+            yield token
+        if key is not None:
+            await self.cache.aset(key, "".join(parts), tags=[cache_tag] if cache_tag else ())
 
-    def _check_burnout_prevention(self):
+    async def _check_burnout_prevention(self, clinician: str = None) -> dict:
         """Suggest breaks if excessive usage is detected."""
-        self.usage_count += 1
-        current_time = time.time()
+        usage = await self.usage.record(clinician or "anonymous", BREAK_INTERVAL_SECONDS)
 
-        if self.usage_count % 5 == 0:
-            print("\n[System]  Pensez à faire une courte pause après", self.usage_count, "requêtes.")
+        if usage["count"] % PAUSE_EVERY_REQUESTS == 0:
+            logger.info("[System] Pensez à faire une courte pause après %d requêtes.", usage["count"])
 
-        if current_time - self.last_break_time > 3600:
-            print("\n[System] Rappel horaire : Prenez 5 minutes pour vous ressourcer !")
-            self.last_break_time = current_time
+        if usage["break_due"]:
+            logger.info("[System] Rappel horaire : Prenez 5 minutes pour vous ressourcer !")
+        return usage
 
-    def describe_medical_history(self, medical_history: dict) -> str:
-        self._check_burnout_prevention()
+    async def aclose(self):
+        """Release the model's HTTP clients."""
+        for name in ("root_async_client", "root_client"):
+            client = getattr(self.llm, name, None)
+            if client is not None:
+                result = client.close()
+                if asyncio.iscoroutine(result):
+                    await result
+
+    async def describe_medical_history(self, medical_history: dict, cache_tag: str = None, clinician: str = None) -> str:
+        await self._check_burnout_prevention(clinician)
+        return await self._describe(medical_history, cache_tag)
+
+    async def _describe(self, medical_history: dict, cache_tag: str = None) -> str:
+        if not medical_history:
+            return None
+
+        prompt = DESCRIBE_TEMPLATE.format(history=medical_history)
+        return await self._cached("describe", medical_history, prompt, cache_tag)
+
+    async def stream_medical_history_description(self, medical_history: dict, cache_tag: str = None, clinician: str = None):
+        """Streaming variant of describe_medical_history."""
+        await self._check_burnout_prevention(clinician)
         if not medical_history:
+            return
+        prompt = DESCRIBE_TEMPLATE.format(history=medical_history)
+        async for token in self._stream_cached("describe", medical_history, prompt, cache_tag):
+            yield token
+
+    async def recommend_instructions(self, medical_history: dict, cache_tag: str = None, clinician: str = None) -> str:
+        """Reuses the (cached) summary from describe_medical_history instead of regenerating it."""
+        await self._check_burnout_prevention(clinician)
+        situation = await self._describe(medical_history, cache_tag)
+        if not situation:
             return None
 
-        template = PromptTemplate(
-            input_variables=["history"],
-            template="""
-            Résumez cet historique médical en français (<250 mots) en utilisant 'Il' :
-            {history}
-
-            Puis ajoutez :
-            1. **Observation de résilience** (ex: "Malgré [condition], il montre [adaptation positive]")
-            2. **Note d'appréciation pour le clinicien** (ex: "Observer [défi] démontre votre attention au détail")
-
-            Structure :
-            [Résumé]...
-            [Résilience]...
-            [Reconnaissance]...
-            """
-        )
-        response = self.llm.invoke(template.format(history=medical_history))
-        return response.content
-
-    def recommend_instructions(self, medical_history: dict) -> str:
-        self._check_burnout_prevention()
-        situation = self.describe_medical_history(medical_history)
+        prompt = RECOMMEND_TEMPLATE.format(situation=situation)
+        return await self._cached("recommend", situation, prompt, cache_tag)
+
+    async def stream_recommend_instructions(self, medical_history: dict, cache_tag: str = None, clinician: str = None):
+        """Streaming variant of recommend_instructions; the summary it builds on is not streamed."""
+        await self._check_burnout_prevention(clinician)
+        situation = await self._describe(medical_history, cache_tag)
         if not situation:
+            return
+        prompt = RECOMMEND_TEMPLATE.format(situation=situation)
+        async for token in self._stream_cached("recommend", situation, prompt, cache_tag):
+            yield token
+
+    def _chunk(self, items: list) -> list:
+        """Group items into consecutive chunks whose estimated size fits in `chunk_tokens`."""
+        chunks, current, size = [], [], 0
+        for item in items:
+            item_tokens = estimate_tokens(str(item))
+            if current and size + item_tokens > self.chunk_tokens:
+                chunks.append(current)
+                current, size = [], 0
+            current.append(item)
+            size += item_tokens
+        if current:
+            chunks.append(current)
+        return chunks
+
+    async def _merge(self, summaries: list) -> str:
+        while len(summaries) > 1:
+            groups = self._chunk(summaries)
+            if len(groups) == len(summaries):
+                # Each summary fills a chunk on its own; merge pairwise to keep shrinking.
+                groups = [summaries[i:i + 2] for i in range(0, len(summaries), 2)]
+            summaries = await asyncio.gather(*[
+                self.gateway.invoke(MERGE_TEMPLATE.format(summaries="\n\n".join(group))) for group in groups
+            ])
+        return summaries[0]
+
+    async def summarize_records(self, records: list) -> str:
+        """Summarize a history of any length: one call if it fits, otherwise map over chunks and reduce."""
+        if not records:
             return None
+        chunks = self._chunk(records)
+        partials = await asyncio.gather(*[
+            self.gateway.invoke(SUMMARY_TEMPLATE.format(records=chunk)) for chunk in chunks
+        ])
+        return await self._merge(list(partials))
 
-        advise_template = PromptTemplate(
-            input_variables=["situation"],
-            template="""
-            En tant que médecin senior compatissant, analysez ce cas :
-            {situation}
-
-            Fournissez en français :
-            1. Recommandations cliniques (à puces)
-            2. Message de soutien émotionnel à l'équipe de soins
-            3. Citation motivationnelle sur la guérison
-
-            Format :
-            [Conseils médicaux]...
-            [Soutien à l'équipe]...
-            [Citation d'inspiration]...
-            """
-        )
-        response = self.llm.invoke(advise_template.format(situation=situation))
-        return response.content
-
-    def emotional_check_in(self) -> str:
+    async def update_summary(self, summary: str, new_records: list) -> str:
+        """Fold only the newly added records into an existing rolling summary."""
+        if not new_records:
+            return summary
+        if not summary:
+            return await self.summarize_records(new_records)
+        if estimate_tokens(str(new_records)) > self.chunk_tokens:
+            delta = await self.summarize_records(new_records)
+            return await self._merge([summary, delta])
+        return await self.gateway.invoke(UPDATE_TEMPLATE.format(summary=summary, records=new_records))
+
+    async def emotional_check_in(self) -> str:
         """Proactive wellness check-in for clinicians."""
         emotional_checkin_prompt = """
         Générer un message de bienveillance pour un clinicien qui :
@@ -80,10 +239,9 @@ class ClinicalAssistantAgent:
 
         Utilisez des métaphores médicales. Limitez à 3 lignes.
         """
-        response = self.llm.invoke(emotional_checkin_prompt)
-        return response.content
+        return await self.gateway.invoke(emotional_checkin_prompt)
 
-    def break_reminder(self) -> str:
+    async def break_reminder(self) -> str:
         """Gentle reminder after intense work sessions."""
         break_reminder_prompt = """
         Vous êtes un assistant médical attentionné. Générez un rappel bref et positif pour un soignant travaillant intensément :
@@ -95,14 +253,16 @@ class ClinicalAssistantAgent:
 
         Gardez sous 2 phrases. Parlez comme un collègue bienveillant.
         """
-        response = self.llm.invoke(break_reminder_prompt)
-        return response.content
+        return await self.gateway.invoke(break_reminder_prompt)
 
-if __name__ == "__main__":
+async def _demo():
     agent = ClinicalAssistantAgent()
     dummy_history = {"symptoms": "fièvre persistante", "treatment": "paracétamol", "background": "antécédent de diabète"}
 
-    print(agent.describe_medical_history(dummy_history))
-    print(agent.recommend_instructions(dummy_history))
-    print(agent.emotional_check_in())
-    print(agent.break_reminder())
+    print(await agent.describe_medical_history(dummy_history))
+    print(await agent.recommend_instructions(dummy_history))
+    print(await agent.emotional_check_in())
+    print(await agent.break_reminder())
+
+if __name__ == "__main__":
+    asyncio.run(_demo())
@@ -0,0 +1,5 @@
+"""Clinical assistant agent.
+
+Kept import-light: LangChain and the LLM client are only loaded when
+`agent.ClinicalAssistant` is imported, which the API defers to app.services.agent_service.
+"""
@@ -0,0 +1,191 @@
+"""Sliding-window admission control in front of the LLM.
+
+Requests and model tokens are budgeted per clinician and across the deployment over a
+sliding window, approximated from two fixed buckets: the previous bucket counts in
+proportion to how much of it still overlaps the window. A clinician past the burnout
+threshold is refused clinical calls until they have had a break, and low-priority calls
+are shed first once the deployment nears saturation.
+
+Counters live in a pluggable store (`read` / `add`); InMemoryWindowStore is per process,
+app.services.admission_service has one shared by every worker.
+"""
+from contextvars import ContextVar
+import asyncio
+import logging
+import math
+import time
+
+logger = logging.getLogger(__name__)
+
+HIGH = "high"
+LOW = "low"
+
+# Clinician the running request was admitted for, so token usage reported by the gateway
+# can be charged to their budget.
+current_clinician = ContextVar("admission_clinician", default=None)
+
+
+class InMemoryWindowStore:
+    """Window buckets held in this process only (bucket id -> [requests, tokens, expires_at])."""
+
+    def __init__(self, clock=time.time):
+        self.clock = clock
+        self._buckets = {}
+        self._adds = 0
+
+    async def read(self, bucket_ids: list) -> dict:
+        return {bucket_id: tuple(self._buckets[bucket_id][:2]) for bucket_id in bucket_ids if bucket_id in self._buckets}
+
+    async def add(self, buckets: dict, requests: int = 0, tokens: int = 0):
+        """Add to each bucket of `buckets` ({bucket id: expires_at epoch seconds})."""
+        for bucket_id, expires_at in buckets.items():
+            counts = self._buckets.setdefault(bucket_id, [0, 0, expires_at])
+            counts[0] += requests
+            counts[1] += tokens
+        self._adds += 1
+        if self._adds % 1024 == 0:
+            now = self.clock()
+            for bucket_id in [key for key, counts in self._buckets.items() if counts[2] < now]:
+                del self._buckets[bucket_id]
+
+
+def _retry_after(previous: float, current: float, limit: int, window: float, elapsed: float) -> int:
+    """Seconds until `previous * overlap + current` leaves room for one more unit."""
+    room = limit - 1
+    if current <= room:
+        # The previous bucket's weight (1 - t / window) must fall to (room - current) / previous.
+        wait = window * (1 - (room - current) / previous) - elapsed
+    else:
+        # Wait for the current bucket to become the previous one and decay in turn.
+        wait = window - elapsed + window * (1 - room / current)
+    return max(1, math.ceil(wait))
+
+
+class AdmissionController:
+    """Decides whether an LLM-backed call may run; a budget of 0 is disabled.
+
+    `admit` returns {"admitted": True} or {"admitted": False, "reason", "retry_after"} with
+    reason "burnout", "clinician_requests", "clinician_tokens", "global_requests",
+    "global_tokens" or "shed". Checks and increments are separate store calls, so concurrent
+    requests may overshoot a budget by a few calls; the store failing admits the call.
+
+    `load`, if given, returns the LLM gateway's current load (in-flight plus queued calls over
+    its concurrency); with the global budgets' usage it defines saturation for shedding.
+    """
+
+    def __init__(self, store=None, window_seconds: int = 60, clinician_requests: int = 0,
+                 clinician_tokens: int = 0, global_requests: int = 0, global_tokens: int = 0,
+                 burnout_requests: int = 0, burnout_window_seconds: int = 3600, shed_threshold: float = 0.8,
+                 load=None, clock=time.time):
+        self.store = store if store is not None else InMemoryWindowStore(clock)
+        self.window_seconds = window_seconds
+        self.clinician_requests = clinician_requests
+        self.clinician_tokens = clinician_tokens
+        self.global_requests = global_requests
+        self.global_tokens = global_tokens
+        self.burnout_requests = burnout_requests
+        self.burnout_window_seconds = burnout_window_seconds
+        self.shed_threshold = shed_threshold
+        self.load = load
+        self.clock = clock
+        self.rejected = {}
+        self._charges = set()
+
+    def _budgets(self, clinician: str, priority: str) -> list:
+        """(reason, counter key, window, field, limit) of each enabled budget, in reporting order."""
+        window = self.window_seconds
+        budgets = [
+            ("clinician_requests", f"clinician:{clinician}", window, 0, self.clinician_requests),
+            ("clinician_tokens", f"clinician:{clinician}", window, 1, self.clinician_tokens),
+            ("global_requests", "global", window, 0, self.global_requests),
+            ("global_tokens", "global", window, 1, self.global_tokens),
+        ]
+        if priority == HIGH:
+            budgets.insert(0, ("burnout", f"clinician:{clinician}", self.burnout_window_seconds, 0, self.burnout_requests))
+        return [budget for budget in budgets if budget[4] > 0]
+
+    @staticmethod
+    def _bucket_id(key: str, window: int, index: int) -> str:
+        return f"{key}|{window}|{index}"
+
+    def _current_buckets(self, counters, now: float) -> dict:
+        buckets = {}
+        for key, window in counters:
+            index = int(now // window)
+            # Kept until it has stopped being the previous bucket too.
+            buckets[self._bucket_id(key, window, index)] = (index + 2) * window
+        return buckets
+
+    def _reject(self, reason: str, retry_after: int) -> dict:
+        self.rejected[reason] = self.rejected.get(reason, 0) + 1
+        return {"admitted": False, "reason": reason, "retry_after": retry_after}
+
+    async def admit(self, clinician: str, priority: str = HIGH) -> dict:
+        now = self.clock()
+        budgets = self._budgets(clinician, priority)
+        load = self.load() if self.load else 0.0
+        if not budgets and (priority == HIGH or load < self.shed_threshold):
+            current_clinician.set(clinician)
+            return {"admitted": True}
+
+        bucket_ids = []
+        for _, key, window, _, _ in budgets:
+            index = int(now // window)
+            bucket_ids += [self._bucket_id(key, window, index - 1), self._bucket_id(key, window, index)]
+        try:
+            counts = await self.store.read(bucket_ids)
+        except Exception:
+            logger.exception("Admission store unavailable; admitting the call")
+            current_clinician.set(clinician)
+            return {"admitted": True}
+
+        saturation = load
+        for reason, key, window, field, limit in budgets:
+            index = int(now // window)
+            elapsed = now - index * window
+            previous = counts.get(self._bucket_id(key, window, index - 1), (0, 0))[field]
+            current = counts.get(self._bucket_id(key, window, index), (0, 0))[field]
+            used = previous * (1 - elapsed / window) + current
+            if used + 1 > limit:
+                return self._reject(reason, _retry_after(previous, current, limit, window, elapsed))
+            if key == "global":
+                saturation = max(saturation, used / limit)
+
+        if priority == LOW and saturation >= self.shed_threshold:
+            return self._reject("shed", max(1, math.ceil(self.window_seconds - now % self.window_seconds)))
+
+        counters = {(key, window) for _, key, window, field, _ in budgets if field == 0}
+        if counters:
+            try:
+                await self.store.add(self._current_buckets(counters, now), requests=1)
+            except Exception:
+                logger.exception("Failed to record an admitted call")
+        current_clinician.set(clinician)
+        return {"admitted": True}
+
+    async def charge(self, clinician: str, tokens: int):
+        """Add model tokens to the clinician's and the global token budgets."""
+        counters = set()
+        if self.clinician_tokens > 0 and clinician:
+            counters.add((f"clinician:{clinician}", self.window_seconds))
+        if self.global_tokens > 0:
+            counters.add(("global", self.window_seconds))
+        if counters and tokens:
+            await self.store.add(self._current_buckets(counters, self.clock()), tokens=tokens)
+
+    def charge_usage(self, usage: dict = None):
+        """Gateway hook: charge a model call's token usage to the admitted clinician, in the background."""
+        tokens = sum((usage or {}).get(kind, 0) for kind in ("input_tokens", "output_tokens"))
+        if not tokens or (self.clinician_tokens <= 0 and self.global_tokens <= 0):
+            return
+        task = asyncio.ensure_future(self.charge(current_clinician.get(), tokens))
+        self._charges.add(task)
+        task.add_done_callback(self._charge_done)
+
+    def _charge_done(self, task):
+        self._charges.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error("Failed to charge LLM tokens", exc_info=task.exception())
+
+    def stats(self) -> dict:
+        return {"rejected": dict(self.rejected), "load": self.load() if self.load else 0.0}
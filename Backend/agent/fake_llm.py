@@ -0,0 +1,70 @@
+import asyncio
+import time
+
+DEFAULT_REPLY = (
+    "[Résumé] Il présente un historique stable. "
+    "[Résilience] Malgré sa condition, il montre une bonne adaptation. "
+    "[Reconnaissance] Votre suivi attentif fait la différence."
+)
+
+
+class FakeMessage:
+    def __init__(self, content: str, input_tokens: int = 0, output_tokens: int = 0):
+        self.content = content
+        self.usage_metadata = {
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "total_tokens": input_tokens + output_tokens,
+        }
+
+
+class FakeChatModel:
+    """Local stand-in for the Groq chat model with injected latency.
+
+    Each call waits `latency` seconds (time to first token), then emits the reply at
+    `tokens_per_second`. Exposes the invoke/ainvoke/stream/astream surface the agent uses.
+    """
+
+    model_name = "fake-chat"
+    temperature = 0.0
+    max_tokens = 500
+
+    def __init__(self, latency: float = 0.5, tokens_per_second: float = 100.0, reply: str = DEFAULT_REPLY):
+        self.latency = latency
+        self.tokens_per_second = tokens_per_second
+        self.reply = reply
+        self.calls = 0
+
+    def _tokens(self):
+        words = self.reply.split(" ")
+        return [word + " " for word in words[:-1]] + words[-1:]
+
+    def _message(self, prompt: str) -> FakeMessage:
+        return FakeMessage(self.reply, len(str(prompt).split()), len(self._tokens()))
+
+    def _generation_time(self) -> float:
+        return len(self._tokens()) / self.tokens_per_second if self.tokens_per_second else 0.0
+
+    def invoke(self, prompt):
+        self.calls += 1
+        time.sleep(self.latency + self._generation_time())
+        return self._message(prompt)
+
+    async def ainvoke(self, prompt):
+        self.calls += 1
+        await asyncio.sleep(self.latency + self._generation_time())
+        return self._message(prompt)
+
+    def stream(self, prompt):
+        self.calls += 1
+        time.sleep(self.latency)
+        for token in self._tokens():
+            time.sleep(1 / self.tokens_per_second if self.tokens_per_second else 0)
+            yield FakeMessage(token)
+
+    async def astream(self, prompt):
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        for token in self._tokens():
+            await asyncio.sleep(1 / self.tokens_per_second if self.tokens_per_second else 0)
+            yield FakeMessage(token)
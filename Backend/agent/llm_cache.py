@@ -0,0 +1,115 @@
+from collections import OrderedDict
+import asyncio
+import hashlib
+import json
+import threading
+
+
+class LLMCache:
+    """Content-addressed cache for LLM completions.
+
+    Keys hash the prompt input together with the prompt-template version and the model
+    parameters, so any change to either yields a new key. Entries live in an in-memory
+    LRU and, optionally, in a second-tier `store` exposing get(key), set(key, value, tags)
+    and delete_tag(tag). Tags (e.g. a patient CIN) allow explicit invalidation.
+    """
+
+    def __init__(self, max_entries: int = 512, store=None):
+        self.max_entries = max_entries
+        self.store = store
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.store_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(kind: str, payload, prompt_version: str, model_params: dict) -> str:
+        material = json.dumps(
+            {"kind": kind, "payload": payload, "prompt_version": prompt_version, "model": model_params},
+            sort_keys=True,
+            ensure_ascii=False,
+            default=str,
+        )
+        return hashlib.sha256(material.encode()).hexdigest()
+
+    def _remember(self, key: str, value: str, tags):
+        with self._lock:
+            self._entries[key] = (value, frozenset(tags))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _memory_get(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.memory_hits += 1
+                return entry[0]
+        return None
+
+    def _store_get(self, key: str):
+        stored = self.store.get(key) if self.store is not None else None
+        if stored is None:
+            with self._lock:
+                self.misses += 1
+            return None
+        value, tags = stored
+        self._remember(key, value, tags)
+        with self._lock:
+            self.store_hits += 1
+        return value
+
+    def get(self, key: str):
+        value = self._memory_get(key)
+        return value if value is not None else self._store_get(key)
+
+    def set(self, key: str, value: str, tags=()):
+        if value is None:
+            return
+        self._remember(key, value, tags)
+        if self.store is not None:
+            self.store.set(key, value, list(tags))
+
+    def invalidate_tag(self, tag: str):
+        with self._lock:
+            for key in [k for k, (_, tags) in self._entries.items() if tag in tags]:
+                del self._entries[key]
+        if self.store is not None:
+            self.store.delete_tag(tag)
+
+    # Async variants: the in-memory tier is answered inline, only the store tier
+    # (blocking I/O) is pushed to a worker thread.
+    async def aget(self, key: str):
+        value = self._memory_get(key)
+        if value is not None:
+            return value
+        if self.store is None:
+            return self._store_get(key)
+        return await asyncio.to_thread(self._store_get, key)
+
+    async def aset(self, key: str, value: str, tags=()):
+        if self.store is None:
+            self.set(key, value, tags)
+        else:
+            await asyncio.to_thread(self.set, key, value, tags)
+
+    async def ainvalidate_tag(self, tag: str):
+        if self.store is None:
+            self.invalidate_tag(tag)
+        else:
+            await asyncio.to_thread(self.invalidate_tag, tag)
+
+    def stats(self) -> dict:
+        with self._lock:
+            hits = self.memory_hits + self.store_hits
+            lookups = hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "memory_hits": self.memory_hits,
+                "store_hits": self.store_hits,
+                "misses": self.misses,
+                "hit_rate": hits / lookups if lookups else 0.0,
+            }
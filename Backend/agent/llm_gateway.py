@@ -0,0 +1,97 @@
+import asyncio
+import hashlib
+import time
+
+
+class LLMGateway:
+    """Async front door to a chat model.
+
+    At most `max_concurrency` completions are in flight at once; callers beyond that wait
+    on a semaphore and the wait is recorded. Concurrent calls with an identical prompt are
+    coalesced onto a single in-flight completion (single-flight).
+
+    `observe(kind, seconds, usage)`, if given, is called after every model call with
+    "invoke" or "stream", the model time (queue wait excluded) and the reported token usage.
+    """
+
+    def __init__(self, llm, max_concurrency: int = 8, observe=None):
+        self.llm = llm
+        self.observe = observe
+        self.max_concurrency = max_concurrency
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._inflight = {}
+        self.calls = 0
+        self.coalesced = 0
+        self.active = 0
+        self.waiting = 0
+        self.queue_wait_total = 0.0
+        self.queue_wait_max = 0.0
+
+    async def _acquire(self):
+        self.waiting += 1
+        started = time.perf_counter()
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        waited = time.perf_counter() - started
+        self.queue_wait_total += waited
+        self.queue_wait_max = max(self.queue_wait_max, waited)
+        self.active += 1
+
+    def _release(self):
+        self.active -= 1
+        self._semaphore.release()
+
+    async def _complete(self, prompt: str) -> str:
+        await self._acquire()
+        try:
+            self.calls += 1
+            started = time.perf_counter()
+            response = await self.llm.ainvoke(prompt)
+            if self.observe:
+                self.observe("invoke", time.perf_counter() - started, getattr(response, "usage_metadata", None))
+            return response.content
+        finally:
+            self._release()
+
+    async def invoke(self, prompt: str) -> str:
+        key = hashlib.sha256(prompt.encode()).hexdigest()
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._complete(prompt))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        else:
+            self.coalesced += 1
+        # shield: one caller going away must not cancel the completion others are awaiting.
+        return await asyncio.shield(task)
+
+    async def stream(self, prompt: str):
+        """Yield completion tokens; streams hold a concurrency slot but are never coalesced."""
+        await self._acquire()
+        try:
+            self.calls += 1
+            started = time.perf_counter()
+            usage = {}
+            async for chunk in self.llm.astream(prompt):
+                chunk_usage = getattr(chunk, "usage_metadata", None) or {}
+                for kind in ("input_tokens", "output_tokens"):
+                    usage[kind] = usage.get(kind, 0) + chunk_usage.get(kind, 0)
+                if chunk.content:
+                    yield chunk.content
+            if self.observe:
+                self.observe("stream", time.perf_counter() - started, usage)
+        finally:
+            self._release()
+
+    def stats(self) -> dict:
+        return {
+            "max_concurrency": self.max_concurrency,
+            "active": self.active,
+            "waiting": self.waiting,
+            "calls": self.calls,
+            "coalesced": self.coalesced,
+            "queue_wait_avg_seconds": self.queue_wait_total / self.calls if self.calls else 0.0,
+            "queue_wait_max_seconds": self.queue_wait_max,
+        }
@@ -0,0 +1,75 @@
+from collections import deque
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class MessagePool:
+    """Pre-generated messages for a fixed prompt, refilled in the background.
+
+    Each pooled message is served once, and refills skip messages that were recently
+    served, so consecutive requests do not see the same text. When the pool drops to
+    `low_water` a refill task tops it back up to `size`; if it is empty the caller
+    falls back to a live `generate()` call.
+    """
+
+    def __init__(self, generate, size: int = 8, low_water: int = 3):
+        self.generate = generate
+        self.size = size
+        self.low_water = low_water
+        self._messages = deque()
+        self._recent = deque(maxlen=max(size * 4, 1))
+        self._refill_task = None
+        self.pool_hits = 0
+        self.live_calls = 0
+
+    def warm(self):
+        """Start filling the pool without waiting for the first request."""
+        if self.size <= 0:
+            return
+        if len(self._messages) <= self.low_water and (self._refill_task is None or self._refill_task.done()):
+            self._refill_task = asyncio.ensure_future(self._refill())
+
+    async def _refill(self):
+        attempts = 0
+        while len(self._messages) < self.size and attempts < self.size * 2:
+            attempts += 1
+            try:
+                message = await self.generate()
+            except Exception:
+                logger.exception("Message pool refill failed")
+                return
+            if message and message not in self._messages and message not in self._recent:
+                self._messages.append(message)
+
+    def pop(self):
+        """Serve a pooled message without calling the model; None when the pool is empty."""
+        message = None
+        if self._messages:
+            message = self._messages.popleft()
+            self.pool_hits += 1
+            self._recent.append(message)
+        self.warm()
+        return message
+
+    async def get(self) -> str:
+        message = self.pop()
+        if message is None:
+            message = await self.generate()
+            self.live_calls += 1
+            self._recent.append(message)
+        return message
+
+    async def close(self):
+        if self._refill_task is not None and not self._refill_task.done():
+            self._refill_task.cancel()
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._messages),
+            "capacity": self.size,
+            "low_water": self.low_water,
+            "pool_hits": self.pool_hits,
+            "live_calls": self.live_calls,
+        }
@@ -0,0 +1,22 @@
+import time
+
+
+class InMemoryUsageStore:
+    """Per-clinician request counters held in this process only.
+
+    Fine for a single worker; multi-worker deployments pass a shared store with the
+    same `record` coroutine (see app.services.usage_service).
+    """
+
+    def __init__(self):
+        self._usage = {}
+
+    async def record(self, clinician: str, break_interval: float) -> dict:
+        """Count one request; `break_due` is True once per `break_interval` seconds."""
+        now = time.time()
+        usage = self._usage.setdefault(clinician, {"count": 0, "last_break_at": now})
+        usage["count"] += 1
+        break_due = now - usage["last_break_at"] > break_interval
+        if break_due:
+            usage["last_break_at"] = now
+        return {"count": usage["count"], "break_due": break_due}
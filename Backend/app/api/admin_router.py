@@ -1,24 +1,38 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, File, HTTPException, Query, UploadFile
+from fastapi.responses import StreamingResponse
 from app.models.user_model import UserLogin
-from app.core.security import get_password_hash, get_current_user
+from app.core.security import hash_password, get_current_user
 from app.services.mongo_service import users_collection
+from app.services.repository import email_exists, get_pending_doctor
+from app.services.key_cache import dek_cache
+from app.services.llm_cache_service import llm_cache
+from app.services.bulk_import import create_job, start_import, remove_spool, import_jobs_collection
+from app.services.audit_service import log_action, audit_filter, query_events, iter_events, EXPORT_FIELDS
+from app.core.config import IMPORT_UPLOAD_DIR
+from datetime import datetime
+from typing import Optional
+import asyncio
+import csv
+import io
+import json
+import os
+import uuid
 
 router = APIRouter()
 
 @router.post("/register_admin")
 async def register_admin(user: UserLogin):
-    existing_admin = users_collection.find_one({"email": user.email})
-    if existing_admin:
+    if await email_exists(user.email):
         raise HTTPException(status_code=400, detail="Admin already exists with this email")
 
-    hashed_pw = get_password_hash(user.password)
+    hashed_pw = await hash_password(user.password)
     new_admin = {
         "email": user.email,
         "hashed_password": hashed_pw,
         "role": "admin",
         "is_active": True
     }
-    users_collection.insert_one(new_admin)
+    await users_collection.insert_one(new_admin)
     return {"message": "Admin registered successfully"}
 
 @router.patch("/validate_doctor/{email}")
@@ -26,12 +40,143 @@ async def validate_doctor(email: str, current_user: dict = Depends(get_current_u
     if current_user["role"] != "admin":
         raise HTTPException(status_code=403, detail="Only admins can validate doctors.")
 
-    doctor = users_collection.find_one({"email": email, "pending_validation": True})
+    doctor = await get_pending_doctor(email)
     if not doctor:
         raise HTTPException(status_code=404, detail="Doctor not found or already validated")
 
-    users_collection.update_one(
+    await users_collection.update_one(
         {"email": email},
         {"$set": {"is_active": True, "pending_validation": False}}
     )
     return {"message": f"Doctor {email} validated successfully"}
+
+@router.get("/cache_stats")
+async def cache_stats(current_user: dict = Depends(get_current_user)):
+    if current_user["role"] != "admin":
+        raise HTTPException(status_code=403, detail="Only admins can view cache statistics.")
+
+    return {"dek_cache": dek_cache.stats(), "llm_cache": llm_cache.stats()}
+
+async def _spool_upload(upload: UploadFile, fmt: str) -> str:
+    """Copy the upload to IMPORT_UPLOAD_DIR chunk by chunk so the job can outlive (and resume after) the request.
+
+    The copy holds plaintext passwords and records: it is readable by this user only and
+    removed by the import job once it completes.
+    """
+    os.makedirs(IMPORT_UPLOAD_DIR, mode=0o700, exist_ok=True)
+    path = os.path.join(IMPORT_UPLOAD_DIR, f"{uuid.uuid4().hex}.{fmt}")
+    try:
+        with os.fdopen(os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600), "wb") as target:
+            while chunk := await upload.read(1 << 20):
+                await asyncio.to_thread(target.write, chunk)
+    except BaseException:
+        remove_spool(path)
+        raise
+    return path
+
+@router.post("/import")
+async def bulk_import(
+    file: UploadFile = File(...),
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    ordered: bool = False,
+    current_user: dict = Depends(get_current_user),
+):
+    if current_user["role"] != "admin":
+        raise HTTPException(status_code=403, detail="Only admins can import data.")
+
+    path = await _spool_upload(file, format)
+    try:
+        job_id = await create_job(path, format, ordered, created_by=current_user["sub"], spooled=True)
+    except BaseException:
+        remove_spool(path)
+        raise
+    await log_action(current_user["sub"], current_user["role"], "Started bulk import", details=f"job {job_id}")
+    start_import(job_id)
+    return {"job_id": job_id, "status": "running"}
+
+@router.get("/import/{job_id}")
+async def bulk_import_status(job_id: str, current_user: dict = Depends(get_current_user)):
+    if current_user["role"] != "admin":
+        raise HTTPException(status_code=403, detail="Only admins can view imports.")
+
+    job = await import_jobs_collection.find_one({"_id": job_id}, {"source": 0})
+    if not job:
+        raise HTTPException(status_code=404, detail="Import job not found")
+    return job
+
+@router.post("/import/{job_id}/resume")
+async def resume_bulk_import(job_id: str, current_user: dict = Depends(get_current_user)):
+    if current_user["role"] != "admin":
+        raise HTTPException(status_code=403, detail="Only admins can resume imports.")
+
+    job = await import_jobs_collection.find_one({"_id": job_id}, {"status": 1})
+    if not job:
+        raise HTTPException(status_code=404, detail="Import job not found")
+    if job["status"] == "completed":
+        raise HTTPException(status_code=400, detail="Import job already completed")
+    if not start_import(job_id):
+        raise HTTPException(status_code=409, detail="Import job is already running")
+    await log_action(current_user["sub"], current_user["role"], "Resumed bulk import", details=f"job {job_id}")
+    return {"job_id": job_id, "status": "running"}
+
+@router.get("/audit_events")
+async def list_audit_events(
+    actor: Optional[str] = None,
+    patient: Optional[str] = None,
+    action: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    current_user: dict = Depends(get_current_user),
+):
+    """Audit events, newest first; pass `next_cursor` back as `cursor` for the next page."""
+    if current_user["role"] != "admin":
+        raise HTTPException(status_code=403, detail="Only admins can view the audit log.")
+
+    try:
+        events, next_cursor = await query_events(audit_filter(actor, patient, action, since, until), limit, cursor)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    await log_action(current_user["sub"], current_user["role"], "Queried audit log", target_cin=patient)
+    return {"events": events, "next_cursor": next_cursor}
+
+async def _export_lines(events, fmt: str):
+    """Encode events as they arrive; CSV output is flushed in ~64 KiB chunks."""
+    if fmt == "ndjson":
+        async for event in events:
+            yield json.dumps(event, ensure_ascii=False) + "\n"
+        return
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_FIELDS)
+    writer.writeheader()
+    async for event in events:
+        writer.writerow(event)
+        if buffer.tell() >= 64 * 1024:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+@router.get("/audit_events/export")
+async def export_audit_events(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    actor: Optional[str] = None,
+    patient: Optional[str] = None,
+    action: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    current_user: dict = Depends(get_current_user),
+):
+    """Every matching audit event, oldest first, streamed in constant memory."""
+    if current_user["role"] != "admin":
+        raise HTTPException(status_code=403, detail="Only admins can export the audit log.")
+
+    await log_action(current_user["sub"], current_user["role"], "Exported audit log", target_cin=patient, details=format)
+    events = iter_events(audit_filter(actor, patient, action, since, until))
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    return StreamingResponse(
+        _export_lines(events, format),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="audit_events.{format}"'},
+    )
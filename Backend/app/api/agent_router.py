@@ -1,34 +1,91 @@
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
 from app.core.security import get_current_user
-from app.services.mongo_service import users_collection, audit_logs_collection
-from app.services.encryption_service import decrypt_patient_data
-from app.services.crypto_utils import derive_kek, decrypt_aes_gcm
-from agent.ClinicalAssistant import ClinicalAssistantAgent
-from datetime import datetime
-import base64
+from app.models.agent_model import BatchDescribeRequest
+from app.services.repository import get_key_material, get_key_material_many
+from app.services.audit_service import log_action
+from app.services.key_service import get_patient_dek
+from app.services.agent_service import aget_agent, agent_status
+from app.services.summary_service import get_rolling_summary
+from app.services.admission_service import admission
+from app.core.config import (
+    AGENT_MESSAGE_POOL_SIZE, AGENT_MESSAGE_POOL_LOW_WATER, AGENT_BATCH_MAX_PATIENTS
+)
+from agent.message_pool import MessagePool
+from agent.admission import HIGH, LOW, current_clinician
+import asyncio
+import json
+import logging
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
-agent = ClinicalAssistantAgent()
+# Pooled messages are shared, so their tokens count against the global budget only.
+async def _generate_checkin() -> str:
+    current_clinician.set(None)
+    agent = await aget_agent()
+    return await agent.emotional_check_in()
+
+async def _generate_break_reminder() -> str:
+    current_clinician.set(None)
+    agent = await aget_agent()
+    return await agent.break_reminder()
+
+checkin_pool = MessagePool(_generate_checkin, size=AGENT_MESSAGE_POOL_SIZE, low_water=AGENT_MESSAGE_POOL_LOW_WATER)
+break_reminder_pool = MessagePool(_generate_break_reminder, size=AGENT_MESSAGE_POOL_SIZE, low_water=AGENT_MESSAGE_POOL_LOW_WATER)
 
-def get_decrypted_medical_history(cin: str):
-    patient = users_collection.find_one({"cin": cin})
+# Sent with a burnout refusal when the reminder pool is empty: refusing a call never calls the model.
+FALLBACK_BREAK_REMINDER = (
+    "Vous avez enchaîné de nombreux dossiers : accordez-vous quelques minutes de pause, étirez vos épaules "
+    "et hydratez-vous. Les pauses augmentent la précision des diagnostics."
+)
+
+async def _admit(current_user: dict, priority: str = HIGH):
+    """Charge the call to admission control, raising unless it is let through.
+
+    Over budget: 429 with Retry-After; past the burnout threshold the 429 carries a break
+    reminder from the pool (or a fixed one); low-priority calls shed under saturation: 503
+    with Retry-After. Called only once the request is authorized, so refused requests cost
+    no budget.
+    """
+    decision = await admission.admit(current_user["sub"], priority)
+    if decision["admitted"]:
+        return
+    headers = {"Retry-After": str(decision["retry_after"])}
+    if decision["reason"] == "burnout":
+        raise HTTPException(status_code=429, headers=headers, detail={
+            "message": "Please take a break before further agent requests.",
+            "reminder": break_reminder_pool.pop() or FALLBACK_BREAK_REMINDER,
+        })
+    if decision["reason"] == "shed":
+        raise HTTPException(status_code=503, detail="The agent is busy, please retry later.", headers=headers)
+    raise HTTPException(status_code=429, detail=f"Agent request budget exceeded ({decision['reason']}).", headers=headers)
+
+async def _pooled_message(pool: MessagePool, current_user: dict) -> str:
+    """A pooled message costs no budget; only a live generation, when the pool is empty, is admitted (low priority)."""
+    message = pool.pop()
+    if message is None:
+        await _admit(current_user, LOW)
+        message = await pool.get()
+    return message
+
+async def get_patient_summary(cin: str, current_user: dict) -> dict:
+    """
+    Rolling summary of the patient's history, kept bounded in size however long the history grows.
+    The call is admitted once the patient is found: an unknown CIN costs no agent budget.
+    """
+    patient = await get_key_material(cin)
     if not patient:
         raise HTTPException(status_code=404, detail="Patient not found.")
 
-    salt = base64.b64decode(patient["salt"])
-    encrypted_dek = base64.b64decode(patient["encrypted_dek"])
-    dek_nonce = base64.b64decode(patient["dek_nonce"])
-
-    kek = derive_kek(cin, salt)
-    dek = decrypt_aes_gcm(kek, dek_nonce, encrypted_dek)
-    dek_bytes = bytes.fromhex(dek.decode())
+    await _admit(current_user, HIGH)
+    dek_bytes = await get_patient_dek(cin, patient)
+    return await _summary_history(cin, dek_bytes)
 
-    decrypted_records = []
-    for entry in patient["medical_history"]:
-        decrypted_entry = decrypt_patient_data(dek_bytes, entry["medical_data_nonce"], entry["encrypted_medical_data"])
-        decrypted_records.append(decrypted_entry)
-    return decrypted_records
+async def _summary_history(cin: str, dek_bytes: bytes) -> dict:
+    summary = await get_rolling_summary(cin, dek_bytes)
+    return {"medical_history": summary} if summary else {}
 
 @router.get("/describe_patient/{cin}")
 async def describe_patient_history(cin: str, current_user: dict = Depends(get_current_user)):
@@ -39,16 +96,12 @@ async def describe_patient_history(cin: str, current_user: dict = Depends(get_cu
     if current_user["role"] != "doctor":
         raise HTTPException(status_code=403, detail="Only doctors can access this endpoint.")
 
-    decrypted_history = get_decrypted_medical_history(cin)
+    history = await get_patient_summary(cin, current_user)
 
-    result = agent.describe_medical_history({"medical_history": decrypted_history})
+    agent = await aget_agent()
+    result = await agent.describe_medical_history(history, cache_tag=cin, clinician=current_user["sub"])
 
-    audit_logs_collection.insert_one({
-        "doctor_email": current_user["sub"],
-        "patient_cin": cin,
-        "action": "Agent summarized patient medical history",
-        "timestamp": datetime.utcnow().isoformat()
-    })
+    await log_action(current_user["sub"], current_user["role"], "Agent summarized patient medical history", target_cin=cin)
 
     return {"summary": result}
 
@@ -61,26 +114,124 @@ async def recommend_patient_instructions(cin: str, current_user: dict = Depends(
     if current_user["role"] != "doctor":
         raise HTTPException(status_code=403, detail="Only doctors can access this endpoint.")
 
-    decrypted_history = get_decrypted_medical_history(cin)
+    history = await get_patient_summary(cin, current_user)
 
-    result = agent.recommend_instructions({"medical_history": decrypted_history})
+    agent = await aget_agent()
+    result = await agent.recommend_instructions(history, cache_tag=cin, clinician=current_user["sub"])
 
-    audit_logs_collection.insert_one({
-        "doctor_email": current_user["sub"],
-        "patient_cin": cin,
-        "action": "Agent provided recommendations for patient",
-        "timestamp": datetime.utcnow().isoformat()
-    })
+    await log_action(current_user["sub"], current_user["role"], "Agent provided recommendations for patient", target_cin=cin)
 
     return {"recommendations": result}
 
+async def _describe_in_batch(cin: str, patient: dict, current_user: dict) -> dict:
+    """One admitted patient of a batch; failures are reported in the result instead of raised."""
+    try:
+        # Every patient's DEK is unwrapped at once (key pool); the model calls wait only on the gateway.
+        dek_bytes = await get_patient_dek(cin, patient)
+        history = await _summary_history(cin, dek_bytes)
+        agent = await aget_agent()
+        summary = await agent.describe_medical_history(history, cache_tag=cin, clinician=current_user["sub"])
+    except Exception:
+        logger.exception("Batch summary failed for a patient")
+        return {"cin": cin, "status": "error", "error": "Summary failed."}
+    await log_action(current_user["sub"], current_user["role"], "Agent summarized patient medical history",
+                     target_cin=cin, details="batch")
+    return {"cin": cin, "status": "ok", "summary": summary}
+
+async def _batch_lines(cins: list, patients: dict, current_user: dict):
+    """NDJSON line per patient in completion order (refusals first), then a line with the totals."""
+    tasks, succeeded = [], 0
+    try:
+        # Each patient is one clinical call for admission control; admitted one after the other so
+        # concurrent checks cannot overshoot the doctor's budget.
+        for cin in cins:
+            if cin not in patients:
+                yield json.dumps({"cin": cin, "status": "error", "error": "Patient not found."}) + "\n"
+                continue
+            decision = await admission.admit(current_user["sub"], HIGH)
+            if not decision["admitted"]:
+                yield json.dumps({
+                    "cin": cin, "status": "rejected", "error": decision["reason"], "retry_after": decision["retry_after"]
+                }) + "\n"
+                continue
+            tasks.append(asyncio.ensure_future(_describe_in_batch(cin, patients[cin], current_user)))
+        for next_result in asyncio.as_completed(tasks):
+            result = await next_result
+            succeeded += result["status"] == "ok"
+            yield json.dumps(result, ensure_ascii=False) + "\n"
+        yield json.dumps({"done": True, "total": len(cins), "succeeded": succeeded, "failed": len(cins) - succeeded}) + "\n"
+    finally:
+        for task in tasks:
+            task.cancel()
+
+@router.post("/describe_patients")
+async def describe_patients_history(request: BatchDescribeRequest, current_user: dict = Depends(get_current_user)):
+    """
+    Summaries of several patients (e.g. a rounds list), streamed as NDJSON as each completes.
+    A patient that fails is reported on its own line without failing the batch.
+    Accessible by Doctors only.
+    """
+    if current_user["role"] != "doctor":
+        raise HTTPException(status_code=403, detail="Only doctors can access this endpoint.")
+
+    cins = list(dict.fromkeys(request.cins))
+    if not cins:
+        raise HTTPException(status_code=400, detail="No patients requested.")
+    if len(cins) > AGENT_BATCH_MAX_PATIENTS:
+        raise HTTPException(status_code=400, detail=f"At most {AGENT_BATCH_MAX_PATIENTS} patients per request.")
+
+    patients = {patient["cin"]: patient for patient in await get_key_material_many(cins) if "salt" in patient}
+    return StreamingResponse(_batch_lines(cins, patients, current_user), media_type="application/x-ndjson")
+
+async def _sse_events(tokens, current_user: dict, cin: str, action: str):
+    """Relay agent tokens as Server-Sent Events; the audit record is written once the stream completes."""
+    async for token in tokens:
+        yield f"data: {json.dumps(token, ensure_ascii=False)}\n\n"
+    await log_action(current_user["sub"], current_user["role"], action, target_cin=cin)
+    yield "event: done\ndata: {}\n\n"
+
+def _sse_response(events) -> StreamingResponse:
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@router.get("/describe_patient/{cin}/stream")
+async def stream_describe_patient_history(cin: str, current_user: dict = Depends(get_current_user)):
+    """
+    Streaming (SSE) variant of /describe_patient/{cin}.
+    Accessible by Doctors only.
+    """
+    if current_user["role"] != "doctor":
+        raise HTTPException(status_code=403, detail="Only doctors can access this endpoint.")
+
+    history = await get_patient_summary(cin, current_user)
+    agent = await aget_agent()
+    tokens = agent.stream_medical_history_description(history, cache_tag=cin, clinician=current_user["sub"])
+    return _sse_response(_sse_events(tokens, current_user, cin, "Agent summarized patient medical history"))
+
+@router.get("/recommend_patient/{cin}/stream")
+async def stream_recommend_patient_instructions(cin: str, current_user: dict = Depends(get_current_user)):
+    """
+    Streaming (SSE) variant of /recommend_patient/{cin}.
+    Accessible by Doctors only.
+    """
+    if current_user["role"] != "doctor":
+        raise HTTPException(status_code=403, detail="Only doctors can access this endpoint.")
+
+    history = await get_patient_summary(cin, current_user)
+    agent = await aget_agent()
+    tokens = agent.stream_recommend_instructions(history, cache_tag=cin, clinician=current_user["sub"])
+    return _sse_response(_sse_events(tokens, current_user, cin, "Agent provided recommendations for patient"))
+
 @router.get("/emotional_checkin")
 async def emotional_checkin(current_user: dict = Depends(get_current_user)):
     """
     Provide a short emotional wellness check-in message.
     Accessible by all authenticated users.
     """
-    result = agent.emotional_check_in()
+    result = await _pooled_message(checkin_pool, current_user)
     return {"message": result}
 
 @router.get("/break_reminder")
@@ -89,5 +240,23 @@ async def break_reminder(current_user: dict = Depends(get_current_user)):
     Send a supportive break reminder.
     Accessible by all authenticated users.
     """
-    result = agent.break_reminder()
+    result = await _pooled_message(break_reminder_pool, current_user)
     return {"reminder": result}
+
+@router.get("/llm_stats")
+async def llm_stats(current_user: dict = Depends(get_current_user)):
+    """
+    Counters of the LLM gateway, admission control and the pre-generated message pools.
+    Accessible by Admins only.
+    """
+    if current_user["role"] != "admin":
+        raise HTTPException(status_code=403, detail="Only admins can access this endpoint.")
+
+    agent = await aget_agent()
+    return {
+        "agent": agent_status(),
+        "admission": admission.stats(),
+        "gateway": agent.gateway.stats(),
+        "emotional_checkin_pool": checkin_pool.stats(),
+        "break_reminder_pool": break_reminder_pool.stats(),
+    }
@@ -1,28 +1,34 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
 from app.models.user_model import UserLogin, UserCreatePatient, UserCreateDoctor
-from app.core.security import get_password_hash, verify_password, create_access_token
+from app.core.security import hash_password, check_password, create_access_token
 from app.services.mongo_service import users_collection, patients_collection, doctors_collection
+from app.services.repository import get_auth_user, email_exists, set_password_hash
+from app.services.encryption_service import prepare_envelope_encryption
 from pymongo.errors import DuplicateKeyError
+import asyncio
 
 router = APIRouter()
 
 @router.post("/register_patient")
 async def register_patient(user: UserCreatePatient):
-    existing_user = users_collection.find_one({"email": user.email})
-    if existing_user:
+    if await email_exists(user.email):
         raise HTTPException(status_code=400, detail="Patient already exists")
 
-    hashed_pw = get_password_hash(user.password)
+    hashed_pw, envelope = await asyncio.gather(
+        hash_password(user.password),
+        asyncio.to_thread(prepare_envelope_encryption, user.cin),
+    )
 
     new_user = {
         "email": user.email,
         "hashed_password": hashed_pw,
         "role": "patient",
         "cin": user.cin,
-        "is_active": True
+        "is_active": True,
+        **envelope
     }
-    users_collection.insert_one(new_user)
+    await users_collection.insert_one(new_user)
 
     new_patient = {
         "email": user.email,
@@ -31,7 +37,7 @@ async def register_patient(user: UserCreatePatient):
     }
         
     try:
-        patients_collection.insert_one(new_patient)
+        await patients_collection.insert_one(new_patient)
     except DuplicateKeyError:
         raise HTTPException(status_code=400, detail="CIN already exists for another patient")
 
@@ -40,11 +46,10 @@ async def register_patient(user: UserCreatePatient):
 
 @router.post("/register_doctor")
 async def register_doctor(user: UserCreateDoctor):
-    existing_user = users_collection.find_one({"email": user.email})
-    if existing_user:
+    if await email_exists(user.email):
         raise HTTPException(status_code=400, detail="Doctor already exists")
 
-    hashed_pw = get_password_hash(user.password)
+    hashed_pw = await hash_password(user.password)
 
     new_user = {
         "email": user.email,
@@ -54,7 +59,7 @@ async def register_doctor(user: UserCreateDoctor):
         "is_active": False,  
         "pending_validation": True
     }
-    users_collection.insert_one(new_user)
+    await users_collection.insert_one(new_user)
 
     new_doctor = {
         "email": user.email,
@@ -62,19 +67,22 @@ async def register_doctor(user: UserCreateDoctor):
         "specialties": [],    
         "validated": False    
     }
-    doctors_collection.insert_one(new_doctor)
+    await doctors_collection.insert_one(new_doctor)
 
     return {"message": "Doctor registration pending admin validation"}
 
 @router.post("/login")
 async def login(form_data: OAuth2PasswordRequestForm = Depends()):
-    existing_user = users_collection.find_one({"email": form_data.username})
+    existing_user = await get_auth_user(form_data.username)
 
     if not existing_user:
         raise HTTPException(status_code=400, detail="Incorrect email or password.")
 
-    if not verify_password(form_data.password, existing_user["hashed_password"]):
+    valid, new_hash = await check_password(form_data.password, existing_user["hashed_password"])
+    if not valid:
         raise HTTPException(status_code=400, detail="Incorrect email or password.")
+    if new_hash:
+        await set_password_hash(existing_user["_id"], new_hash)
 
     if not existing_user.get("is_active", False):
         raise HTTPException(status_code=403, detail="Account pending validation by admin.")
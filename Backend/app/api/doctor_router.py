@@ -1,78 +1,125 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from app.core.security import get_current_user
-from app.services.mongo_service import users_collection, audit_logs_collection
-from app.services.encryption_service import encrypt_patient_data, decrypt_patient_data
-from app.services.crypto_utils import derive_kek, decrypt_aes_gcm
-import base64
+from app.services.mongo_service import medical_records_collection
+from app.services.repository import get_key_material, get_key_material_many, get_history_page, count_history, search_records
+from app.services.blind_index import normalize_terms, record_tokens, query_tokens
+from app.core.config import BLIND_INDEX_ENABLED
+from app.services.audit_service import log_action
+from app.services.key_service import get_patient_dek
+from app.services.llm_cache_service import llm_cache
+from app.services.summary_service import refresh_summary
+from app.services.encryption_service import encrypt_record, decrypt_record
 from datetime import datetime
 from pydantic import BaseModel
+import asyncio
+import json
 
 router = APIRouter()
 
 
 @router.patch("/update_patient_history/{cin}")
-async def update_patient_history(cin: str, new_record: dict, current_user: dict = Depends(get_current_user)):
+async def update_patient_history(cin: str, new_record: dict, background_tasks: BackgroundTasks, current_user: dict = Depends(get_current_user)):
     if current_user["role"] != "doctor":
         raise HTTPException(status_code=403, detail="Only doctors can update patient data.")
 
-    patient = users_collection.find_one({"cin": cin})
+    patient = await get_key_material(cin)
     if not patient:
         raise HTTPException(status_code=404, detail="Patient not found")
 
-    salt = base64.b64decode(patient["salt"])
-    encrypted_dek = base64.b64decode(patient["encrypted_dek"])
-    dek_nonce = base64.b64decode(patient["dek_nonce"])
+    dek_bytes = await get_patient_dek(cin, patient)
 
-    kek = derive_kek(cin, salt)
-    dek = decrypt_aes_gcm(kek, dek_nonce, encrypted_dek)
-    dek_bytes = bytes.fromhex(dek.decode())
+    encrypted_data = encrypt_record(dek_bytes, new_record)
 
-    encrypted_data = encrypt_patient_data(dek_bytes, str(new_record))
-
-    update_query = {
-        "$push": {
-            "medical_history": encrypted_data
-        }
-    }
-    users_collection.update_one({"cin": cin}, update_query)
-    audit_entry = {
-        "doctor_email": current_user["sub"],
-        "patient_cin": cin,
-        "action": "Updated patient's medical history",
-        "timestamp": datetime.utcnow().isoformat()
-    }
-    audit_logs_collection.insert_one(audit_entry)
+    await medical_records_collection.insert_one({
+        "cin": cin,
+        "created_at": datetime.utcnow(),
+        "created_by": current_user["sub"],
+        **encrypted_data,
+        **({"blind_index": record_tokens(new_record)} if BLIND_INDEX_ENABLED else {})
+    })
+    await llm_cache.ainvalidate_tag(cin)
+    background_tasks.add_task(refresh_summary, cin, dek_bytes, current_user["sub"])
+    await log_action(current_user["sub"], current_user["role"], "Updated patient's medical history", target_cin=cin)
     return {"message": "Medical history updated and encrypted successfully"}
 
 
 @router.get("/doctor/get_patient_history/{cin}")
-async def get_patient_history(cin: str, current_user: dict = Depends(get_current_user)):
+async def get_patient_history(
+    cin: str,
+    offset: int = Query(0, ge=0),
+    limit: int = Query(50, ge=1, le=500),
+    newest_first: bool = False,
+    stream: bool = False,
+    current_user: dict = Depends(get_current_user),
+):
     if current_user["role"] != "doctor":
         raise HTTPException(status_code=403, detail="Only doctors can access this data.")
 
-    patient = users_collection.find_one({"cin": cin})
+    patient, entries, total = await asyncio.gather(
+        get_key_material(cin),
+        get_history_page(cin, offset, limit, newest_first),
+        count_history(cin),
+    )
     if not patient:
         raise HTTPException(status_code=404, detail="Patient not found")
 
-    salt = base64.b64decode(patient["salt"])
-    encrypted_dek = base64.b64decode(patient["encrypted_dek"])
-    dek_nonce = base64.b64decode(patient["dek_nonce"])
+    dek_bytes = await get_patient_dek(cin, patient)
 
-    kek = derive_kek(cin, salt)
-    dek = decrypt_aes_gcm(kek, dek_nonce, encrypted_dek)
+    await log_action(current_user["sub"], current_user["role"], "Retrieved patient's medical summary", target_cin=cin)
 
-    decrypted_records = []
-    for entry in patient["medical_history"]:
-        dek_bytes = bytes.fromhex(dek.decode())
-        decrypted_entry = decrypt_patient_data(dek_bytes, entry["medical_data_nonce"], entry["encrypted_medical_data"])
-        decrypted_records.append(decrypted_entry)
+    def decrypt_entries():
+        for entry in entries:
+            yield decrypt_record(dek_bytes, entry)
 
-    audit_entry = {
-        "doctor_email": current_user["sub"],
-        "patient_cin": cin,
-        "action": "Retrieved patient's medical summary",
-        "timestamp": datetime.utcnow().isoformat()
+    if stream:
+        return StreamingResponse(
+            (json.dumps(record, default=str) + "\n" for record in decrypt_entries()),
+            media_type="application/x-ndjson",
+        )
+
+    next_offset = offset + len(entries)
+    return {
+        "medical_history": list(decrypt_entries()),
+        "total": total,
+        "offset": offset,
+        "limit": limit,
+        "next_offset": next_offset if next_offset < total else None,
     }
-    audit_logs_collection.insert_one(audit_entry)
-    return {"medical_history": decrypted_records}
 
+
+@router.get("/search_records")
+async def search_patient_records(
+    q: str = Query(..., min_length=3, max_length=200),
+    limit: int = Query(50, ge=1, le=200),
+    current_user: dict = Depends(get_current_user),
+):
+    """Records containing every term of `q`, resolved through the blind index; only matches are decrypted."""
+    if current_user["role"] != "doctor":
+        raise HTTPException(status_code=403, detail="Only doctors can search patient records.")
+    if not BLIND_INDEX_ENABLED:
+        raise HTTPException(status_code=404, detail="Record search is not enabled.")
+
+    tokens = query_tokens(q)
+    if not tokens:
+        raise HTTPException(status_code=400, detail="The query has no searchable terms.")
+
+    entries = await search_records(tokens, limit)
+    cins = sorted({entry["cin"] for entry in entries})
+    patients = {patient["cin"]: patient for patient in await get_key_material_many(cins) if "salt" in patient}
+    cins = [cin for cin in cins if cin in patients]
+    deks = dict(zip(cins, await asyncio.gather(*[get_patient_dek(cin, patients[cin]) for cin in cins])))
+
+    terms = normalize_terms(q)
+    results = []
+    for entry in entries:
+        if entry["cin"] not in deks:
+            continue
+        record = decrypt_record(deks[entry["cin"]], entry)
+        # Guards against a truncated-HMAC collision: the decrypted record must really hold the terms.
+        if terms <= normalize_terms(json.dumps(record, ensure_ascii=False, default=str)):
+            results.append({"cin": entry["cin"], "created_at": entry["created_at"], "record": record})
+
+    for cin in sorted({result["cin"] for result in results}):
+        await log_action(current_user["sub"], current_user["role"], "Searched patient's medical records", target_cin=cin)
+    return {"results": results, "count": len(results)}
@@ -4,4 +4,84 @@ import os
 load_dotenv()
 
 MONGO_URI = os.getenv("MONGO_URI")
-JWT_SECRET_KEY = os.getenv("JWT_SECRET_KEY")
\ No newline at end of file
+MONGO_DATABASE = os.getenv("MONGO_DATABASE", "MediSync")
+JWT_SECRET_KEY = os.getenv("JWT_SECRET_KEY")
+
+DEK_CACHE_MAX_ENTRIES = int(os.getenv("DEK_CACHE_MAX_ENTRIES", "1024"))
+DEK_CACHE_TTL_SECONDS = float(os.getenv("DEK_CACHE_TTL_SECONDS", "300"))
+
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "50"))
+MONGO_EXECUTOR_WORKERS = int(os.getenv("MONGO_EXECUTOR_WORKERS", str(MONGO_MAX_POOL_SIZE)))
+MONGO_CONNECT_TIMEOUT_MS = int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", "5000"))
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "5000"))
+MONGO_SOCKET_TIMEOUT_MS = int(os.getenv("MONGO_SOCKET_TIMEOUT_MS", "10000"))
+MONGO_READ_PREFERENCE = os.getenv("MONGO_READ_PREFERENCE", "primary")
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+# Adds per-request stage timings to responses; off by default since it exposes internal timings to clients.
+SERVER_TIMING_ENABLED = os.getenv("SERVER_TIMING_ENABLED", "false").lower() == "true"
+
+MONGO_ENSURE_INDEXES = os.getenv("MONGO_ENSURE_INDEXES", "true").lower() == "true"
+MONGO_INDEX_DIAGNOSTICS = os.getenv("MONGO_INDEX_DIAGNOSTICS", "false").lower() == "true"
+MONGO_SLOW_QUERY_MS = float(os.getenv("MONGO_SLOW_QUERY_MS", "200"))
+
+AUDIT_QUEUE_MAX_SIZE = int(os.getenv("AUDIT_QUEUE_MAX_SIZE", "10000"))
+AUDIT_BATCH_SIZE = int(os.getenv("AUDIT_BATCH_SIZE", "500"))
+AUDIT_FLUSH_INTERVAL_SECONDS = float(os.getenv("AUDIT_FLUSH_INTERVAL_SECONDS", "1.0"))
+# Audit events older than this are removed by MongoDB; 0 keeps them forever.
+AUDIT_RETENTION_DAYS = int(os.getenv("AUDIT_RETENTION_DAYS", "0"))
+
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "512"))
+LLM_CACHE_MONGO_ENABLED = os.getenv("LLM_CACHE_MONGO_ENABLED", "false").lower() == "true"
+LLM_CACHE_KEY = os.getenv("LLM_CACHE_KEY")
+LLM_CACHE_TTL_SECONDS = int(os.getenv("LLM_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+CLINICIAN_USAGE_TTL_SECONDS = int(os.getenv("CLINICIAN_USAGE_TTL_SECONDS", str(24 * 3600)))
+# Patients per batch summary request (/agent/describe_patients). Every patient of a batch is summarized
+# at once, bounded only by the LLM gateway: a batch of at most LLM_MAX_CONCURRENCY patients takes about
+# as long as its slowest summary.
+AGENT_BATCH_MAX_PATIENTS = int(os.getenv("AGENT_BATCH_MAX_PATIENTS", "50"))
+
+# Sliding-window budgets in front of /agent, per clinician and across the deployment (0 disables
+# a budget). "mongo" shares the counters between worker processes, "memory" keeps them per process;
+# gunicorn.conf.py defaults it to "mongo" when it starts more than one worker.
+ADMISSION_STORE = os.getenv("ADMISSION_STORE", "memory")
+ADMISSION_WINDOW_SECONDS = int(os.getenv("ADMISSION_WINDOW_SECONDS", "60"))
+ADMISSION_CLINICIAN_REQUESTS = int(os.getenv("ADMISSION_CLINICIAN_REQUESTS", "20"))
+ADMISSION_CLINICIAN_TOKENS = int(os.getenv("ADMISSION_CLINICIAN_TOKENS", "20000"))
+ADMISSION_GLOBAL_REQUESTS = int(os.getenv("ADMISSION_GLOBAL_REQUESTS", "120"))
+ADMISSION_GLOBAL_TOKENS = int(os.getenv("ADMISSION_GLOBAL_TOKENS", "200000"))
+# A clinician past this many clinical agent calls within the burnout window is sent a break reminder instead.
+ADMISSION_BURNOUT_REQUESTS = int(os.getenv("ADMISSION_BURNOUT_REQUESTS", "60"))
+ADMISSION_BURNOUT_WINDOW_SECONDS = int(os.getenv("ADMISSION_BURNOUT_WINDOW_SECONDS", "3600"))
+# Low-priority calls (live check-ins and reminders, background summary refreshes) are shed once global
+# usage or LLM load reaches this fraction.
+ADMISSION_SHED_THRESHOLD = float(os.getenv("ADMISSION_SHED_THRESHOLD", "0.8"))
+
+# Set AGENT_ENABLED=false on workers that should not serve /agent: LangChain is then never imported.
+AGENT_ENABLED = os.getenv("AGENT_ENABLED", "true").lower() == "true"
+# Load the agent (and fill the message pools) in the background at startup instead of on first use.
+AGENT_WARMUP = os.getenv("AGENT_WARMUP", "true").lower() == "true"
+AGENT_MESSAGE_POOL_SIZE = int(os.getenv("AGENT_MESSAGE_POOL_SIZE", "8"))
+AGENT_MESSAGE_POOL_LOW_WATER = int(os.getenv("AGENT_MESSAGE_POOL_LOW_WATER", "3"))
+AGENT_SUMMARY_CHUNK_TOKENS = int(os.getenv("AGENT_SUMMARY_CHUNK_TOKENS", "3000"))
+
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(os.cpu_count() or 1)))
+# Processes deriving PBKDF2 KEKs on DEK cache misses, off the event loop.
+KEY_DERIVATION_WORKERS = int(os.getenv("KEY_DERIVATION_WORKERS", str(os.cpu_count() or 1)))
+
+IMPORT_WORKERS = int(os.getenv("IMPORT_WORKERS", str(os.cpu_count() or 1)))
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", "200"))
+IMPORT_UPLOAD_DIR = os.getenv("IMPORT_UPLOAD_DIR", "/tmp/medisync_imports")
+
+# "pbkdf2": DEKs wrapped by a KEK derived from the patient's CIN (legacy).
+# "master": DEKs wrapped (AES-KW) by a per-patient key derived with HKDF from the server master key.
+KEY_WRAPPING_MODE = os.getenv("KEY_WRAPPING_MODE", "pbkdf2")
+MASTER_KEY_FILE = os.getenv("MASTER_KEY_FILE")
+MASTER_KEY_ID = os.getenv("MASTER_KEY_ID", "master-1")
+
+# Opt-in keyword search over encrypted records: HMAC tokens of normalized terms are stored
+# on each record, keyed by a dedicated 32-byte key (raw or hex) read from BLIND_INDEX_KEY_FILE.
+BLIND_INDEX_ENABLED = os.getenv("BLIND_INDEX_ENABLED", "false").lower() == "true"
+BLIND_INDEX_KEY_FILE = os.getenv("BLIND_INDEX_KEY_FILE")
@@ -0,0 +1,140 @@
+"""Request and stage-level timing, exported in the Prometheus text format at /metrics.
+
+Stages are timed with `stage_timer` / `timed` (Mongo calls, crypto primitives, LLM calls)
+and observed into one histogram labelled by stage. When SERVER_TIMING_ENABLED is set, the
+stage totals of each request are also returned in a `Server-Timing` header.
+
+Labels never carry request data: routes are reported by their template
+(`/doctor/update_patient_history/{cin}`), never by the concrete path.
+
+Kept free of MongoDB imports so the crypto helpers can use it inside pool workers.
+"""
+from app.core.config import SERVER_TIMING_ENABLED
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Histogram, REGISTRY, generate_latest
+import os
+import time
+
+REQUEST_LATENCY = Histogram(
+    "medisync_http_request_duration_seconds",
+    "HTTP request latency by route template and status.",
+    ["method", "route", "status"],
+)
+STAGE_LATENCY = Histogram(
+    "medisync_stage_duration_seconds",
+    "Time spent in instrumented stages (mongo.*, crypto.*, llm.*).",
+    ["stage"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+LLM_TOKENS = Counter("medisync_llm_tokens_total", "LLM tokens reported by the model.", ["kind"])
+
+# Per-request stage totals, only set while SERVER_TIMING_ENABLED.
+_request_stages = ContextVar("request_stages", default=None)
+
+
+def observe_stage(stage: str, seconds: float):
+    STAGE_LATENCY.labels(stage).observe(seconds)
+    stages = _request_stages.get()
+    if stages is not None:
+        stages[stage] = stages.get(stage, 0.0) + seconds
+
+
+@contextmanager
+def stage_timer(stage: str):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(stage, time.perf_counter() - started)
+
+
+def timed(stage: str):
+    """Decorator form of stage_timer for synchronous functions."""
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                observe_stage(stage, time.perf_counter() - started)
+        return wrapper
+    return decorator
+
+
+def observe_llm_call(kind: str, seconds: float, usage: dict = None):
+    """Hook passed to the LLM gateway: one call of `kind` ("invoke" or "stream") and its token usage."""
+    observe_stage(f"llm.{kind}", seconds)
+    if usage:
+        LLM_TOKENS.labels("input").inc(usage.get("input_tokens", 0))
+        LLM_TOKENS.labels("output").inc(usage.get("output_tokens", 0))
+
+
+def _route_template(scope) -> str:
+    """Template of the route the request was dispatched to, from `scope["route"]` after routing.
+
+    Depending on the FastAPI release, the path_format of an included router's route carries
+    the router prefix or not; the missing leading segments are that (static) prefix, so they
+    are taken from the concrete path.
+    """
+    template = getattr(scope.get("route"), "path_format", None)
+    if template is None:
+        return "unmatched"
+    path_segments = scope["path"].rstrip("/").split("/")
+    template_segments = template.rstrip("/").split("/")
+    prefix = path_segments[:max(1, len(path_segments) - len(template_segments) + 1)]
+    return "/".join(prefix) + template
+
+
+def _server_timing(stages: dict, total: float) -> bytes:
+    entries = [f"{stage.replace('.', '-')};dur={seconds * 1000:.2f}" for stage, seconds in stages.items()]
+    entries.append(f"app;dur={total * 1000:.2f}")
+    return ", ".join(entries).encode()
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording REQUEST_LATENCY; adds Server-Timing when enabled.
+
+    The header is written with the response start, so for streaming responses it covers
+    the stages that ran before the first byte.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status = 500
+        token = _request_stages.set({}) if SERVER_TIMING_ENABLED else None
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if token is not None:
+                    timing = _server_timing(_request_stages.get(), time.perf_counter() - started)
+                    message = dict(message, headers=list(message.get("headers", [])) + [(b"server-timing", timing)])
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            REQUEST_LATENCY.labels(scope["method"], _route_template(scope), str(status)).observe(time.perf_counter() - started)
+            if token is not None:
+                _request_stages.reset(token)
+
+
+def render_metrics() -> (bytes, str):
+    """Exposition for /metrics; aggregates all workers when PROMETHEUS_MULTIPROC_DIR is set."""
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
@@ -3,9 +3,16 @@ from fastapi.security import OAuth2PasswordBearer
 from passlib.context import CryptContext
 from datetime import datetime, timedelta
 from jose import jwt, JWTError
-from app.core.config import JWT_SECRET_KEY
+from concurrent.futures import ProcessPoolExecutor
+import asyncio
+import multiprocessing
+from app.core.config import JWT_SECRET_KEY, BCRYPT_ROUNDS, PASSWORD_HASH_WORKERS
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
+
+# bcrypt is CPU-bound and holds the GIL, so it runs in its own process pool rather
+# than on the event loop or the I/O thread pool.
+_password_pool = None
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
 
@@ -15,6 +22,42 @@ def get_password_hash(password: str) -> str:
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
+def _bcrypt_rounds(hashed_password: str) -> int:
+    # $2b$<rounds>$<salt+hash>
+    return int(hashed_password.split("$")[2])
+
+def verify_and_rehash(plain_password: str, hashed_password: str):
+    """Verify a password; if it matches but was hashed with another cost, also return a fresh hash."""
+    if not pwd_context.verify(plain_password, hashed_password):
+        return False, None
+    if _bcrypt_rounds(hashed_password) != BCRYPT_ROUNDS:
+        return True, pwd_context.hash(plain_password)
+    return True, None
+
+def _get_password_pool() -> ProcessPoolExecutor:
+    global _password_pool
+    if _password_pool is None:
+        _password_pool = ProcessPoolExecutor(
+            max_workers=PASSWORD_HASH_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _password_pool
+
+def shutdown_password_pool():
+    global _password_pool
+    if _password_pool is not None:
+        _password_pool.shutdown(wait=True)
+        _password_pool = None
+
+async def hash_password(password: str) -> str:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_password_pool(), get_password_hash, password)
+
+async def check_password(plain_password: str, hashed_password: str):
+    """Async verify_and_rehash, run in the password process pool."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_password_pool(), verify_and_rehash, plain_password, hashed_password)
+
 def create_access_token(data: dict, expires_delta: timedelta = timedelta(minutes=30)):
     to_encode = data.copy()
     expire = datetime.utcnow() + expires_delta
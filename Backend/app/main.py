@@ -1,16 +1,71 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Response
 from app.api import auth_router, doctor_router,admin_router
+from app.services.audit_service import audit_writer
+from app.core.security import shutdown_password_pool
+from app.services.bulk_import import shutdown_import_pool
+from app.services.key_service import shutdown_key_pool
+from app.services.index_service import ensure_indexes, log_collscans
+from app.services.mongo_service import get_client, close_client
+from app.services.agent_service import start_warmup, agent_status, close_agent
+from app.core.config import MONGO_ENSURE_INDEXES, MONGO_INDEX_DIAGNOSTICS, AGENT_ENABLED, AGENT_WARMUP, METRICS_ENABLED
+from app.core.metrics import MetricsMiddleware, render_metrics
+import asyncio
+
+if AGENT_ENABLED:
+    from app.api import agent_router
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Runs in every worker after fork: per-process clients are created here, never at import.
+    get_client()
+    if MONGO_ENSURE_INDEXES:
+        await asyncio.to_thread(ensure_indexes)
+    if MONGO_INDEX_DIAGNOSTICS:
+        await asyncio.to_thread(log_collscans)
+    await audit_writer.start()
+    if AGENT_ENABLED and AGENT_WARMUP:
+        start_warmup(agent_router.checkin_pool.warm, agent_router.break_reminder_pool.warm)
+    yield
+    if AGENT_ENABLED:
+        await agent_router.checkin_pool.close()
+        await agent_router.break_reminder_pool.close()
+    await audit_writer.stop()
+    await close_agent()
+    shutdown_password_pool()
+    shutdown_import_pool()
+    shutdown_key_pool()
+    close_client()
+
 
 app = FastAPI(
     title="MediSync Backend",
     description="Backend API for MediSync healthcare platform",
-    version="0.1.0"
+    version="0.1.0",
+    lifespan=lifespan
 )
 
+if METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+
 app.include_router(auth_router.router, prefix="/auth", tags=["Authentication"])
 app.include_router(doctor_router.router, prefix="/doctor", tags=["Doctor"])
 app.include_router(admin_router.router, prefix="/admin", tags=["Administration"])
+if AGENT_ENABLED:
+    app.include_router(agent_router.router, prefix="/agent", tags=["Agent"])
 
 @app.get("/")
 async def root():
-    return {"message": "Hello World"}
\ No newline at end of file
+    return {"message": "Hello World"}
+
+@app.get("/ready")
+async def ready():
+    """Readiness of the optional subsystems; the agent loads in the background after startup."""
+    return {"agent": agent_status() if AGENT_ENABLED else {"state": "disabled"}}
+
+if METRICS_ENABLED:
+    @app.get("/metrics", include_in_schema=False)
+    async def metrics():
+        body, content_type = render_metrics()
+        return Response(content=body, media_type=content_type)
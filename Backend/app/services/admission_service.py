@@ -0,0 +1,58 @@
+from agent.admission import AdmissionController, InMemoryWindowStore
+from app.core.config import (
+    ADMISSION_STORE, ADMISSION_WINDOW_SECONDS, ADMISSION_CLINICIAN_REQUESTS, ADMISSION_CLINICIAN_TOKENS,
+    ADMISSION_GLOBAL_REQUESTS, ADMISSION_GLOBAL_TOKENS, ADMISSION_BURNOUT_REQUESTS,
+    ADMISSION_BURNOUT_WINDOW_SECONDS, ADMISSION_SHED_THRESHOLD,
+)
+from app.services.mongo_service import AsyncCollection
+from datetime import datetime
+from pymongo import UpdateOne
+
+admission_collection = AsyncCollection("agent_admission")
+
+
+class MongoWindowStore:
+    """Admission window buckets shared by every worker process.
+
+    One document per bucket, incremented with $inc; buckets expire through the TTL index
+    on `expires_at` declared in index_service.
+    """
+
+    def __init__(self, collection: AsyncCollection = admission_collection):
+        self.collection = collection
+
+    async def read(self, bucket_ids: list) -> dict:
+        if not bucket_ids:
+            return {}
+        docs = await self.collection.find({"_id": {"$in": bucket_ids}})
+        return {doc["_id"]: (doc.get("requests", 0), doc.get("tokens", 0)) for doc in docs}
+
+    async def add(self, buckets: dict, requests: int = 0, tokens: int = 0):
+        await self.collection.bulk_write([
+            UpdateOne(
+                {"_id": bucket_id},
+                {"$inc": {"requests": requests, "tokens": tokens},
+                 "$setOnInsert": {"expires_at": datetime.utcfromtimestamp(expires_at)}},
+                upsert=True,
+            )
+            for bucket_id, expires_at in buckets.items()
+        ], ordered=False)
+
+
+def _gateway_load() -> float:
+    from app.services.agent_service import agent_load  # agent_service charges tokens through `admission`
+    return agent_load()
+
+
+admission = AdmissionController(
+    store=MongoWindowStore() if ADMISSION_STORE == "mongo" else InMemoryWindowStore(),
+    window_seconds=ADMISSION_WINDOW_SECONDS,
+    clinician_requests=ADMISSION_CLINICIAN_REQUESTS,
+    clinician_tokens=ADMISSION_CLINICIAN_TOKENS,
+    global_requests=ADMISSION_GLOBAL_REQUESTS,
+    global_tokens=ADMISSION_GLOBAL_TOKENS,
+    burnout_requests=ADMISSION_BURNOUT_REQUESTS,
+    burnout_window_seconds=ADMISSION_BURNOUT_WINDOW_SECONDS,
+    shed_threshold=ADMISSION_SHED_THRESHOLD,
+    load=_gateway_load,
+)
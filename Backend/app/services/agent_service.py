@@ -0,0 +1,89 @@
+from app.core.config import LLM_MAX_CONCURRENCY, AGENT_SUMMARY_CHUNK_TOKENS
+from app.services.llm_cache_service import llm_cache
+from app.services.admission_service import admission
+from app.services.usage_service import MongoUsageStore
+from app.core.metrics import observe_llm_call
+import asyncio
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+_agent = None
+_lock = threading.Lock()
+_warmup_task = None
+_status = {"state": "cold", "error": None, "load_seconds": None}
+
+def _observe_llm_call(kind: str, seconds: float, usage: dict = None):
+    observe_llm_call(kind, seconds, usage)
+    admission.charge_usage(usage)
+
+def get_agent():
+    """ClinicalAssistantAgent of this worker process, built on first use (never before fork).
+
+    The first call imports LangChain and builds the LLM client; from a coroutine use
+    `aget_agent`, which does that off the event loop.
+    """
+    global _agent
+    if _agent is None:
+        with _lock:
+            if _agent is None:
+                _status.update(state="loading", error=None)
+                started = time.perf_counter()
+                try:
+                    from agent.ClinicalAssistant import ClinicalAssistantAgent
+                    agent = ClinicalAssistantAgent(
+                        cache=llm_cache,
+                        max_concurrency=LLM_MAX_CONCURRENCY,
+                        chunk_tokens=AGENT_SUMMARY_CHUNK_TOKENS,
+                        usage=MongoUsageStore(),
+                        observe=_observe_llm_call,
+                    )
+                except Exception as exc:
+                    _status.update(state="failed", error=str(exc))
+                    raise
+                _status.update(state="ready", load_seconds=round(time.perf_counter() - started, 3))
+                _agent = agent
+    return _agent
+
+async def aget_agent():
+    if _agent is not None:
+        return _agent
+    return await asyncio.to_thread(get_agent)
+
+def start_warmup(*on_ready):
+    """Load the agent in the background; each `on_ready` callable runs once it is loaded."""
+    global _warmup_task
+
+    async def warm():
+        try:
+            await aget_agent()
+        except Exception:
+            logger.exception("Agent warm-up failed")
+            return
+        for callback in on_ready:
+            callback()
+
+    if _warmup_task is None or _warmup_task.done():
+        _warmup_task = asyncio.ensure_future(warm())
+
+def agent_load() -> float:
+    """In-flight plus queued LLM calls over the gateway's concurrency (0 while the agent is not loaded)."""
+    if _agent is None:
+        return 0.0
+    gateway = _agent.gateway
+    return (gateway.active + gateway.waiting) / gateway.max_concurrency
+
+def agent_status() -> dict:
+    return dict(_status)
+
+async def close_agent():
+    global _agent, _warmup_task
+    if _warmup_task is not None and not _warmup_task.done():
+        _warmup_task.cancel()
+    _warmup_task = None
+    if _agent is not None:
+        await _agent.aclose()
+        _agent = None
+        _status.update(state="cold", load_seconds=None)
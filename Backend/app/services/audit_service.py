@@ -1,14 +1,179 @@
-from app.services.mongo_service import audit_logs_collection
+from app.services.mongo_service import audit_events_collection, executor
+from app.core.config import AUDIT_QUEUE_MAX_SIZE, AUDIT_BATCH_SIZE, AUDIT_FLUSH_INTERVAL_SECONDS
+from bson import ObjectId
 from datetime import datetime
+from itertools import islice
+from pymongo import ASCENDING, DESCENDING
+import asyncio
+import base64
+import json
+import logging
 import socket
 
-def log_action(user_email: str, user_role: str, action: str, target_cin: str = None, details: str = ""):
-    audit_logs_collection.insert_one({
-        "timestamp": datetime.utcnow().isoformat(),
-        "user_email": user_email,
-        "user_role": user_role,
+logger = logging.getLogger(__name__)
+
+
+class AuditWriter:
+    """Buffers audit records in a bounded queue and flushes them with insert_many.
+
+    A flush happens when `batch_size` records are pending or `flush_interval` seconds
+    have passed since the first pending record. A full queue makes `enqueue` wait,
+    which is the backpressure applied to callers.
+    """
+
+    def __init__(self, collection, max_queue_size: int = AUDIT_QUEUE_MAX_SIZE,
+                 batch_size: int = AUDIT_BATCH_SIZE, flush_interval: float = AUDIT_FLUSH_INTERVAL_SECONDS):
+        self.collection = collection
+        self.max_queue_size = max_queue_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.host = {}
+        self._queue = None
+        self._task = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def start(self):
+        hostname = socket.gethostname()
+        try:
+            ip_address = await asyncio.to_thread(socket.gethostbyname, hostname)
+        except OSError:
+            ip_address = None
+        self.host = {"hostname": hostname, "ip_address": ip_address}
+        self._queue = asyncio.Queue(maxsize=self.max_queue_size)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Flush everything still queued, then stop the background task."""
+        if not self.running:
+            return
+        await self._queue.put(None)
+        await self._task
+        self._task = None
+
+    async def enqueue(self, record: dict):
+        if not self.running:
+            await self.collection.insert_one(record)
+            return
+        await self._queue.put(record)
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            record = await self._queue.get()
+            if record is None:
+                break
+            batch = [record]
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    record = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if record is None:
+                    stopping = True
+                    break
+                batch.append(record)
+            await self._flush(batch)
+
+    async def _flush(self, batch: list):
+        try:
+            await self.collection.insert_many(batch, ordered=False)
+        except Exception:
+            logger.exception("Failed to write %d audit records", len(batch))
+
+
+audit_writer = AuditWriter(audit_events_collection)
+
+EXPORT_FIELDS = ("id", "timestamp", "actor_email", "actor_role", "action", "patient_cin", "details", "ip_address", "hostname")
+
+
+async def log_action(user_email: str, user_role: str, action: str, target_cin: str = None, details: str = ""):
+    await audit_writer.enqueue({
+        "timestamp": datetime.utcnow(),
+        "meta": {"actor_email": user_email, "actor_role": user_role},
         "action": action,
-        "target_cin": target_cin,
+        "patient_cin": target_cin,
         "details": details,
-        "ip_address": socket.gethostbyname(socket.gethostname())
+        "ip_address": audit_writer.host.get("ip_address"),
+        "hostname": audit_writer.host.get("hostname"),
     })
+
+
+def audit_filter(actor: str = None, patient: str = None, action: str = None,
+                 since: datetime = None, until: datetime = None) -> dict:
+    query = {}
+    if actor:
+        query["meta.actor_email"] = actor
+    if patient:
+        query["patient_cin"] = patient
+    if action:
+        query["action"] = action
+    if since or until:
+        query["timestamp"] = {**({"$gte": since} if since else {}), **({"$lt": until} if until else {})}
+    return query
+
+
+def flatten_event(event: dict) -> dict:
+    meta = event.get("meta") or {}
+    return {
+        "id": str(event["_id"]),
+        "timestamp": event["timestamp"].isoformat(),
+        "actor_email": meta.get("actor_email"),
+        "actor_role": meta.get("actor_role"),
+        "action": event.get("action"),
+        "patient_cin": event.get("patient_cin"),
+        "details": event.get("details"),
+        "ip_address": event.get("ip_address"),
+        "hostname": event.get("hostname"),
+    }
+
+
+def encode_cursor(event: dict) -> str:
+    position = {"t": event["timestamp"].isoformat(), "id": str(event["_id"])}
+    return base64.urlsafe_b64encode(json.dumps(position).encode()).decode()
+
+
+def _after_cursor(cursor: str) -> dict:
+    """Filter for the events strictly older than the cursor position; ValueError if malformed."""
+    try:
+        position = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        timestamp, event_id = datetime.fromisoformat(position["t"]), ObjectId(position["id"])
+    except Exception as exc:
+        raise ValueError("Invalid cursor") from exc
+    return {"$or": [
+        {"timestamp": {"$lt": timestamp}},
+        {"timestamp": timestamp, "_id": {"$lt": event_id}},
+    ]}
+
+
+async def query_events(query: dict, limit: int, cursor: str = None) -> (list, str):
+    """One page of events, newest first, and the cursor of the next page (None on the last one)."""
+    if cursor:
+        query = {"$and": [query, _after_cursor(cursor)]}
+    events = await audit_events_collection.find(
+        query, sort=[("timestamp", DESCENDING), ("_id", DESCENDING)], limit=limit + 1
+    )
+    next_cursor = encode_cursor(events[limit - 1]) if len(events) > limit else None
+    return [flatten_event(event) for event in events[:limit]], next_cursor
+
+
+async def iter_events(query: dict, batch_size: int = 1000):
+    """Yield every matching event, oldest first, holding at most one batch in memory."""
+    cursor = audit_events_collection.sync.find(query, sort=[("timestamp", ASCENDING)], batch_size=batch_size)
+    loop = asyncio.get_running_loop()
+    try:
+        while True:
+            batch = await loop.run_in_executor(executor, lambda: list(islice(cursor, batch_size)))
+            if not batch:
+                break
+            for event in batch:
+                yield flatten_event(event)
+    finally:
+        cursor.close()
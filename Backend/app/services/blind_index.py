@@ -0,0 +1,101 @@
+"""Blind-index tokens for keyword search over encrypted medical records.
+
+Each record stores, next to its ciphertext, the HMAC-SHA256 (truncated to 16 bytes) of
+every normalized term it contains, keyed by a dedicated index key that never encrypts
+data. A search HMACs the query terms the same way and matches them with one indexed
+query; only the matching records are then decrypted.
+
+The tokens are deterministic, so anyone with database access can tell that two records
+share a term (not which term). This is the trade-off of the feature, which is why it is
+opt-in (BLIND_INDEX_ENABLED).
+
+Kept free of MongoDB imports so the bulk-import workers can compute tokens.
+"""
+from app.services.crypto_utils import read_key_file
+from app.core.config import BLIND_INDEX_KEY_FILE
+import hashlib
+import hmac
+import logging
+import re
+import unicodedata
+
+logger = logging.getLogger(__name__)
+
+TOKEN_CONTEXT = b"medisync/blind-index/v1|"
+MAX_TOKENS_PER_RECORD = 256
+MIN_TERM_LENGTH = 3
+
+STOPWORDS = frozenset("""
+    les des une est par pour avec sans dans sur sous entre vers chez mais donc car que qui quoi
+    dont son sa ses leur leurs nous vous ils elles elle lui aux ces cet cette tout tous toute
+    toutes plus moins tres pas non oui ete etre avoir fait sont ont the and
+""".split())
+
+_WORD = re.compile(r"[a-z0-9]+")
+_index_key = None
+
+
+def load_index_key() -> bytes:
+    """Read the 32-byte index key (raw or hex-encoded) from BLIND_INDEX_KEY_FILE once per process."""
+    global _index_key
+    if _index_key is None:
+        if not BLIND_INDEX_KEY_FILE:
+            raise RuntimeError("BLIND_INDEX_KEY_FILE is not configured")
+        _index_key = read_key_file(BLIND_INDEX_KEY_FILE, "Blind index key")
+    return _index_key
+
+
+def _strip_accents(text: str) -> str:
+    return "".join(char for char in unicodedata.normalize("NFKD", text) if not unicodedata.combining(char))
+
+
+def _stem(term: str) -> str:
+    # Singular/plural only: "diabètes" and "diabète" index the same term.
+    if len(term) > 4 and term[-1] in "sx":
+        return term[:-1]
+    return term
+
+
+def _terms(text: str):
+    for word in _WORD.findall(_strip_accents(text.lower())):
+        if len(word) >= MIN_TERM_LENGTH and word not in STOPWORDS:
+            yield _stem(word)
+
+
+def normalize_terms(text: str) -> set:
+    """Lower-cased, accent-free, lightly stemmed terms of `text`, without French stopwords."""
+    return set(_terms(text))
+
+
+def _texts(value):
+    if isinstance(value, dict):
+        for key, item in value.items():
+            yield str(key)
+            yield from _texts(item)
+    elif isinstance(value, (list, tuple)):
+        for item in value:
+            yield from _texts(item)
+    elif value is not None:
+        yield str(value)
+
+
+def term_token(term: str, key: bytes = None) -> str:
+    key = key if key is not None else load_index_key()
+    return hmac.new(key, TOKEN_CONTEXT + term.encode(), hashlib.sha256).hexdigest()[:32]
+
+
+def record_tokens(record, key: bytes = None) -> list:
+    """Sorted blind-index tokens for the terms found in a record's keys and values.
+
+    Past MAX_TOKENS_PER_RECORD distinct terms, the ones appearing first in the record are kept.
+    """
+    terms = {}
+    for text in _texts(record):
+        terms.update(dict.fromkeys(_terms(text)))
+    if len(terms) > MAX_TOKENS_PER_RECORD:
+        logger.warning("Record has %d distinct terms; only the first %d are searchable", len(terms), MAX_TOKENS_PER_RECORD)
+    return sorted(term_token(term, key) for term in list(terms)[:MAX_TOKENS_PER_RECORD])
+
+
+def query_tokens(query: str, key: bytes = None) -> list:
+    return sorted(term_token(term, key) for term in normalize_terms(query))
@@ -0,0 +1,322 @@
+"""Bulk import of patients and their medical records from NDJSON or CSV.
+
+Each row is one patient: `email`, `password`, `cin` and an optional `records` list (a JSON
+array in a CSV column). Password hashing, key generation and record encryption run in a
+process pool; writes go out as one bulk_write per collection per batch. Progress, per-row
+errors and the last committed line are kept in `import_jobs`, so a failed or interrupted
+job can be resumed where it stopped. An upload spooled by the API holds plaintext patient
+data and is deleted when its job completes.
+
+    python -m app.services.bulk_import patients.ndjson --format ndjson
+    python -m app.services.bulk_import patients.csv --format csv --job-id <id>   # resume
+"""
+from app.services.mongo_service import AsyncCollection, users_collection, patients_collection, medical_records_collection
+from app.services.import_worker import prepare_row
+from app.services.encryption_service import KEY_MATERIAL_PROJECTION
+from app.services.audit_service import log_action
+from app.core.config import IMPORT_WORKERS, IMPORT_BATCH_SIZE
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pymongo import InsertOne, UpdateOne, ReturnDocument
+from pymongo.errors import BulkWriteError
+import argparse
+import asyncio
+import csv
+import json
+import logging
+import multiprocessing
+import os
+import uuid
+
+logger = logging.getLogger(__name__)
+
+import_jobs_collection = AsyncCollection("import_jobs")
+
+MAX_REPORTED_ERRORS = 1000
+FORMATS = ("ndjson", "csv")
+DUPLICATE_KEY = 11000
+
+_import_pool = None
+
+
+def _get_import_pool() -> ProcessPoolExecutor:
+    global _import_pool
+    if _import_pool is None:
+        _import_pool = ProcessPoolExecutor(max_workers=IMPORT_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+    return _import_pool
+
+
+def shutdown_import_pool():
+    global _import_pool
+    if _import_pool is not None:
+        _import_pool.shutdown(wait=False, cancel_futures=True)
+        _import_pool = None
+
+
+def remove_spool(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def iter_rows(path: str, fmt: str):
+    """Yield (line, row) lazily; a row that cannot be parsed is yielded as the exception."""
+    with open(path, newline="", encoding="utf-8") as source:
+        if fmt == "ndjson":
+            for line, text in enumerate(source, 1):
+                if not text.strip():
+                    continue
+                try:
+                    yield line, json.loads(text)
+                except ValueError as exc:
+                    yield line, exc
+        else:
+            reader = csv.DictReader(source)
+            for row in reader:
+                try:
+                    if row.get("records"):
+                        row["records"] = json.loads(row["records"])
+                    yield reader.line_num, row
+                except ValueError as exc:
+                    yield reader.line_num, exc
+
+
+def _next_batch(rows, size: int, after_line: int) -> list:
+    batch = []
+    for line, row in rows:
+        if line <= after_line:
+            continue
+        batch.append((line, row))
+        if len(batch) >= size:
+            break
+    return batch
+
+
+def _without(document: dict, *keys) -> dict:
+    return {key: value for key, value in document.items() if key not in keys}
+
+
+async def _bulk_write(collection, operations: list, lines: list, ordered: bool, errors: list, label: str) -> set:
+    """Run one bulk_write and return the positions that failed, reporting them per source line."""
+    if not operations:
+        return set()
+    try:
+        await collection.bulk_write(operations, ordered=ordered)
+        return set()
+    except BulkWriteError as exc:
+        failed = set()
+        write_errors = exc.details.get("writeErrors", [])
+        for error in write_errors:
+            if label == "record" and error.get("code") == DUPLICATE_KEY:
+                continue  # already written by an earlier, interrupted attempt
+            failed.add(error["index"])
+            errors.append({"line": lines[error["index"]], "error": f"{label}: {error.get('errmsg')}"})
+        if ordered and write_errors:
+            stopped_at = write_errors[0]["index"]
+            for index in range(stopped_at + 1, len(operations)):
+                failed.add(index)
+                errors.append({"line": lines[index], "error": f"{label}: not attempted, ordered batch stopped"})
+        return failed
+
+
+async def _import_batch(job: dict, batch: list, errors: list) -> int:
+    job_id, ordered = job["_id"], job.get("ordered", False)
+    loop = asyncio.get_running_loop()
+
+    rows = []
+    for line, row in batch:
+        if isinstance(row, Exception):
+            errors.append({"line": line, "error": f"parse: {row}"})
+        elif not isinstance(row, dict):
+            errors.append({"line": line, "error": "parse: row is not an object"})
+        else:
+            rows.append((line, row))
+
+    emails = [str(row["email"]) for _, row in rows if row.get("email")]
+    cins = [str(row["cin"]) for _, row in rows if row.get("cin")]
+    existing_users, existing_patients = await asyncio.gather(
+        users_collection.find(
+            {"email": {"$in": emails}},
+            dict(KEY_MATERIAL_PROJECTION, email=1, import_job=1),
+        ),
+        patients_collection.find({"cin": {"$in": cins}}, {"cin": 1, "import_job": 1}),
+    )
+    users_by_email = {user["email"]: user for user in existing_users}
+    patients_by_cin = {patient["cin"]: patient for patient in existing_patients}
+
+    futures = []
+    seen = set()
+    for line, row in rows:
+        email, cin = str(row.get("email")), str(row.get("cin"))
+        if ("email", email) in seen or ("cin", cin) in seen:
+            errors.append({"line": line, "error": "email or CIN repeated within the same batch"})
+            continue
+        seen.update({("email", email), ("cin", cin)})
+        user = users_by_email.get(email)
+        patient = patients_by_cin.get(cin)
+        if user and user.get("import_job") != job_id:
+            errors.append({"line": line, "error": "email already registered"})
+            continue
+        if patient and patient.get("import_job") != job_id:
+            errors.append({"line": line, "error": "CIN already exists for another patient"})
+            continue
+        futures.append((line, loop.run_in_executor(_get_import_pool(), prepare_row, job_id, line, row, user)))
+
+    prepared = []
+    for line, future in futures:
+        try:
+            prepared.append(await future)
+        except Exception as exc:
+            errors.append({"line": line, "error": f"prepare: {exc}"})
+
+    # Upserts scoped to this job keep a replayed batch idempotent while a CIN or email
+    # owned by anyone else still fails on the unique index.
+    new_rows = [row for row in prepared if row["user"] is not None]
+    failed = await _bulk_write(
+        patients_collection,
+        [UpdateOne({"cin": row["cin"], "import_job": job_id}, {"$setOnInsert": _without(row["patient"], "cin", "import_job")}, upsert=True)
+         for row in new_rows],
+        [row["line"] for row in new_rows], ordered, errors, "patient",
+    )
+    failed_lines = {row["line"] for index, row in enumerate(new_rows) if index in failed}
+    new_rows = [row for index, row in enumerate(new_rows) if index not in failed]
+    failed = await _bulk_write(
+        users_collection,
+        [UpdateOne({"email": row["email"], "import_job": job_id}, {"$setOnInsert": _without(row["user"], "email", "import_job")}, upsert=True)
+         for row in new_rows],
+        [row["line"] for row in new_rows], ordered, errors, "user",
+    )
+    failed_lines |= {row["line"] for index, row in enumerate(new_rows) if index in failed}
+
+    written = [row for row in prepared if row["line"] not in failed_lines]
+    record_ops, record_lines = [], []
+    for row in written:
+        for record in row["records"]:
+            record_ops.append(InsertOne(record))
+            record_lines.append(row["line"])
+    failed = await _bulk_write(medical_records_collection, record_ops, record_lines, False, errors, "record")
+    failed_lines |= {record_lines[index] for index in failed}
+
+    return len([row for row in written if row["line"] not in failed_lines])
+
+
+async def create_job(source: str, fmt: str, ordered: bool = False, created_by: str = None, spooled: bool = False) -> str:
+    """Register an import of `source`; a `spooled` source is a copy owned by the job and deleted when it completes."""
+    if fmt not in FORMATS:
+        raise ValueError(f"Unsupported format {fmt!r}, expected one of {FORMATS}")
+    job_id = uuid.uuid4().hex
+    now = datetime.utcnow()
+    await import_jobs_collection.insert_one({
+        "_id": job_id,
+        "source": source,
+        "format": fmt,
+        "ordered": ordered,
+        "created_by": created_by,
+        "spooled": spooled,
+        "status": "pending",
+        "processed": 0,
+        "imported": 0,
+        "failed": 0,
+        "last_line": 0,
+        "errors": [],
+        "created_at": now,
+        "updated_at": now,
+    })
+    return job_id
+
+
+async def run_import(job_id: str, batch_size: int = IMPORT_BATCH_SIZE, progress=None) -> dict:
+    """Run (or resume) an import job from its last committed line."""
+    job = await import_jobs_collection.find_one({"_id": job_id})
+    if job is None:
+        raise ValueError(f"Unknown import job {job_id}")
+    await import_jobs_collection.update_one({"_id": job_id}, {"$set": {"status": "running", "updated_at": datetime.utcnow()}})
+
+    try:
+        rows = iter_rows(job["source"], job["format"])
+        last_line = job["last_line"]
+        while True:
+            batch = await asyncio.to_thread(_next_batch, rows, batch_size, last_line)
+            if not batch:
+                break
+            errors = []
+            imported = await _import_batch(job, batch, errors)
+            last_line = batch[-1][0]
+            failed_lines = {error["line"] for error in errors}
+            job = await import_jobs_collection.find_one_and_update(
+                {"_id": job_id},
+                {
+                    "$set": {"last_line": last_line, "updated_at": datetime.utcnow()},
+                    "$inc": {"processed": len(batch), "imported": imported, "failed": len(failed_lines)},
+                    "$push": {"errors": {"$each": errors, "$slice": MAX_REPORTED_ERRORS}},
+                },
+                projection={"errors": 0},
+                return_document=ReturnDocument.AFTER,
+            )
+            if progress:
+                progress(job)
+    except Exception as exc:
+        logger.exception("Import job %s failed", job_id)
+        job = await import_jobs_collection.find_one_and_update(
+            {"_id": job_id}, {"$set": {"status": "failed", "failure": str(exc), "updated_at": datetime.utcnow()}},
+            projection={"errors": 0}, return_document=ReturnDocument.AFTER,
+        )
+        # The spooled source is kept so the job can be resumed.
+        await _log_job(job, "Bulk import failed")
+        raise
+
+    job = await import_jobs_collection.find_one_and_update(
+        {"_id": job_id}, {"$set": {"status": "completed", "updated_at": datetime.utcnow()}, "$unset": {"failure": ""}},
+        projection={"errors": 0}, return_document=ReturnDocument.AFTER,
+    )
+    if job.get("spooled"):
+        await asyncio.to_thread(remove_spool, job["source"])
+    await _log_job(job, "Bulk import completed")
+    return job
+
+
+async def _log_job(job: dict, action: str):
+    await log_action(
+        job.get("created_by"), "system", action,
+        details=f"job {job['_id']}: {job['processed']} processed, {job['imported']} imported, {job['failed']} failed",
+    )
+
+
+_running_jobs = {}
+
+
+def start_import(job_id: str) -> bool:
+    """Run an import job in the background of the API process; False if it is already running."""
+    task = _running_jobs.get(job_id)
+    if task is not None and not task.done():
+        return False
+    task = asyncio.create_task(run_import(job_id))
+    task.add_done_callback(lambda done: done.cancelled() or done.exception())
+    _running_jobs[job_id] = task
+    task.add_done_callback(lambda _: _running_jobs.pop(job_id, None))
+    return True
+
+
+def _print_progress(job: dict):
+    print(f"line {job['last_line']}: {job['processed']} rows processed, {job['imported']} imported, {job['failed']} failed")
+
+
+async def _main(args):
+    job_id = args.job_id or await create_job(args.path, args.format, args.ordered, created_by="cli")
+    print(f"Import job {job_id}")
+    try:
+        job = await run_import(job_id, args.batch_size, progress=_print_progress)
+    finally:
+        shutdown_import_pool()
+    print(f"Done: {job['imported']} imported, {job['failed']} failed. Errors: GET /admin/import/{job_id}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bulk import of patients and medical records.")
+    parser.add_argument("path", help="NDJSON or CSV file (ignored when resuming with --job-id)")
+    parser.add_argument("--format", choices=FORMATS, default="ndjson")
+    parser.add_argument("--job-id", help="resume an existing job from its last committed line")
+    parser.add_argument("--ordered", action="store_true", help="stop each batch at its first failed write")
+    parser.add_argument("--batch-size", type=int, default=IMPORT_BATCH_SIZE)
+    asyncio.run(_main(parser.parse_args()))
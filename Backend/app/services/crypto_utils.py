@@ -1,9 +1,27 @@
 from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+from cryptography.hazmat.primitives.keywrap import aes_key_wrap, aes_key_unwrap
 from cryptography.hazmat.primitives import hashes
 from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from app.core.metrics import timed
 import os
 import base64
 
+def read_key_file(path: str, name: str) -> bytes:
+    """32-byte key stored in `path`, raw or hex-encoded; `name` labels the error."""
+    with open(path, "rb") as key_file:
+        content = key_file.read()
+    if len(content) != 32:
+        # Only the hex form may carry whitespace: a raw key can start or end with a whitespace byte.
+        try:
+            content = bytes.fromhex(content.decode("ascii").strip())
+        except ValueError:
+            pass
+    if len(content) != 32:
+        raise RuntimeError(f"{name} must be 32 bytes (raw or hex-encoded)")
+    return content
+
+@timed("crypto.derive_kek")
 def derive_kek(cin: str, salt: bytes) -> bytes:
     kdf = PBKDF2HMAC(
         algorithm=hashes.SHA256(),
@@ -13,13 +31,34 @@ def derive_kek(cin: str, salt: bytes) -> bytes:
     )
     return kdf.derive(cin.encode())
 
-def encrypt_aes_gcm(key: bytes, plaintext: str) -> (bytes, bytes):
+@timed("crypto.encrypt_aes_gcm")
+def encrypt_aes_gcm(key: bytes, plaintext, associated_data: bytes = None) -> (bytes, bytes):
     aesgcm = AESGCM(key)
     nonce = os.urandom(12)
-    ciphertext = aesgcm.encrypt(nonce, plaintext.encode(), None)
+    data = plaintext.encode() if isinstance(plaintext, str) else plaintext
+    ciphertext = aesgcm.encrypt(nonce, data, associated_data)
     return nonce, ciphertext
 
-def decrypt_aes_gcm(key: bytes, nonce: bytes, ciphertext: bytes) -> bytes:
+@timed("crypto.decrypt_aes_gcm")
+def decrypt_aes_gcm(key: bytes, nonce: bytes, ciphertext: bytes, associated_data: bytes = None) -> bytes:
     aesgcm = AESGCM(key)
-    plaintext = aesgcm.decrypt(nonce, ciphertext, None)
+    plaintext = aesgcm.decrypt(nonce, ciphertext, associated_data)
     return plaintext
+
+@timed("crypto.derive_wrapping_key")
+def derive_wrapping_key(master_key: bytes, salt: bytes, cin: str) -> bytes:
+    hkdf = HKDF(
+        algorithm=hashes.SHA256(),
+        length=32,
+        salt=salt,
+        info=b"medisync/dek-wrap/" + cin.encode(),
+    )
+    return hkdf.derive(master_key)
+
+@timed("crypto.wrap_key")
+def wrap_key(wrapping_key: bytes, key: bytes) -> bytes:
+    return aes_key_wrap(wrapping_key, key)
+
+@timed("crypto.unwrap_key")
+def unwrap_key(wrapping_key: bytes, wrapped_key: bytes) -> bytes:
+    return aes_key_unwrap(wrapping_key, wrapped_key)
@@ -1,20 +1,115 @@
 import base64
-from app.services.crypto_utils import derive_kek, encrypt_aes_gcm, decrypt_aes_gcm
+from app.services.crypto_utils import (
+    derive_kek, encrypt_aes_gcm, decrypt_aes_gcm, derive_wrapping_key, wrap_key, unwrap_key, read_key_file
+)
+from app.services.key_cache import dek_cache
+from app.core.config import KEY_WRAPPING_MODE, MASTER_KEY_FILE, MASTER_KEY_ID
+from bson import Binary
+import ast
+import json
 import os
+import zlib
 
-def prepare_envelope_encryption(cin: str) -> dict:
-    salt = os.urandom(16)
-    dek = os.urandom(32)
+try:
+    import zstandard
+except ImportError:  # optional: records fall back to zlib
+    zstandard = None
+
+# Envelope versions, recorded as `key_version` on the user document (absent means 1).
+KEY_VERSION_PBKDF2 = 1
+KEY_VERSION_MASTER = 2
 
+_master_key = None
+
+def load_master_key() -> bytes:
+    """Read the 32-byte master key (raw or hex-encoded) from MASTER_KEY_FILE once per process."""
+    global _master_key
+    if _master_key is None:
+        if not MASTER_KEY_FILE:
+            raise RuntimeError("MASTER_KEY_FILE is not configured")
+        _master_key = read_key_file(MASTER_KEY_FILE, "Master key")
+    return _master_key
+
+def _pbkdf2_envelope(cin: str, dek: bytes, salt: bytes) -> dict:
     kek = derive_kek(cin, salt)
     dek_nonce, encrypted_dek = encrypt_aes_gcm(kek, dek.hex())
-
     return {
         "encrypted_dek": base64.b64encode(encrypted_dek).decode(),
         "dek_nonce": base64.b64encode(dek_nonce).decode(),
         "salt": base64.b64encode(salt).decode()
     }
 
+def _master_envelope(cin: str, dek: bytes, salt: bytes) -> dict:
+    wrapping_key = derive_wrapping_key(load_master_key(), salt, cin)
+    return {
+        "key_version": KEY_VERSION_MASTER,
+        "master_key_id": MASTER_KEY_ID,
+        "wrapped_dek": base64.b64encode(wrap_key(wrapping_key, dek)).decode(),
+        "salt": base64.b64encode(salt).decode()
+    }
+
+def wrap_patient_dek(cin: str, dek: bytes) -> dict:
+    """Envelope for `dek` under the configured KEY_WRAPPING_MODE, with a fresh salt."""
+    salt = os.urandom(16)
+    if KEY_WRAPPING_MODE == "master":
+        return _master_envelope(cin, dek, salt)
+    return _pbkdf2_envelope(cin, dek, salt)
+
+def generate_patient_keys(cin: str) -> (dict, bytes):
+    """New wrapped-DEK envelope for a patient, plus the plaintext DEK for immediate use."""
+    dek = os.urandom(32)
+    return wrap_patient_dek(cin, dek), dek
+
+def prepare_envelope_encryption(cin: str) -> dict:
+    envelope, _ = generate_patient_keys(cin)
+    return envelope
+
+KEY_MATERIAL_PROJECTION = {
+    "_id": 0, "salt": 1, "encrypted_dek": 1, "dek_nonce": 1, "key_version": 1, "wrapped_dek": 1, "master_key_id": 1
+}
+RECORD_PROJECTION = {"_id": 0, "record": 1, "encrypted_medical_data": 1, "medical_data_nonce": 1}
+
+# Binary record envelope, stored as BSON Binary under `record`:
+#   version (1 byte) | compression (1 byte) | nonce (12 bytes) | AES-GCM ciphertext
+# The two header bytes are authenticated as associated data.
+RECORD_FORMAT_VERSION = 1
+COMPRESSION_NONE = 0
+COMPRESSION_ZLIB = 1
+COMPRESSION_ZSTD = 2
+COMPRESSION_MIN_BYTES = 128
+
+def envelope_parts(patient: dict) -> (bytes, int, bytes):
+    """(salt, key_version, wrapped DEK) of a patient's envelope; salt and wrapped DEK key the DEK cache."""
+    salt = base64.b64decode(patient["salt"])
+    version = patient.get("key_version", KEY_VERSION_PBKDF2)
+    wrapped = base64.b64decode(patient["wrapped_dek"] if version == KEY_VERSION_MASTER else patient["encrypted_dek"])
+    return salt, version, wrapped
+
+def derive_patient_dek(cin: str, patient: dict) -> bytes:
+    """Unwrap the DEK without touching the cache, so it can run in a worker process."""
+    salt, version, wrapped = envelope_parts(patient)
+    if version == KEY_VERSION_MASTER:
+        return unwrap_key(derive_wrapping_key(load_master_key(), salt, cin), wrapped)
+    dek_nonce = base64.b64decode(patient["dek_nonce"])
+    kek = derive_kek(cin, salt)
+    return bytes.fromhex(decrypt_aes_gcm(kek, dek_nonce, wrapped).decode())
+
+def unwrap_patient_dek(cin: str, patient: dict) -> bytes:
+    salt, _, wrapped = envelope_parts(patient)
+    dek = dek_cache.get(cin, salt, wrapped)
+    if dek is None:
+        dek = derive_patient_dek(cin, patient)
+        dek_cache.put(cin, salt, wrapped, dek)
+    return dek
+
+def needs_rewrap(patient: dict) -> bool:
+    """True when the envelope predates the configured wrapping mode and should be migrated."""
+    return KEY_WRAPPING_MODE == "master" and patient.get("key_version", KEY_VERSION_PBKDF2) != KEY_VERSION_MASTER
+
+def rewrap_legacy_envelope(cin: str, patient: dict) -> dict:
+    """Unwrap a PBKDF2 envelope and return the master-key envelope replacing it (no I/O)."""
+    return _master_envelope(cin, unwrap_patient_dek(cin, patient), os.urandom(16))
+
 def decrypt_patient_data(dek: bytes, nonce_b64: str, ciphertext_b64: str) -> str:
     nonce = base64.b64decode(nonce_b64)
     ciphertext = base64.b64decode(ciphertext_b64)
@@ -27,3 +122,49 @@ def encrypt_patient_data(dek: bytes, plaintext: str) -> dict:
         "encrypted_medical_data": base64.b64encode(ciphertext).decode(),
         "medical_data_nonce": base64.b64encode(nonce).decode()
     }
+
+
+def _compress(payload: bytes) -> (int, bytes):
+    if len(payload) < COMPRESSION_MIN_BYTES:
+        return COMPRESSION_NONE, payload
+    if zstandard is not None:
+        flag, compressed = COMPRESSION_ZSTD, zstandard.ZstdCompressor(level=3).compress(payload)
+    else:
+        flag, compressed = COMPRESSION_ZLIB, zlib.compress(payload, 6)
+    return (flag, compressed) if len(compressed) < len(payload) else (COMPRESSION_NONE, payload)
+
+def _decompress(flag: int, body: bytes) -> bytes:
+    if flag == COMPRESSION_NONE:
+        return body
+    if flag == COMPRESSION_ZLIB:
+        return zlib.decompress(body)
+    if flag == COMPRESSION_ZSTD:
+        if zstandard is None:
+            raise RuntimeError("Record is zstd-compressed but the zstandard package is not installed")
+        return zstandard.ZstdDecompressor().decompress(body)
+    raise ValueError(f"Unknown record compression flag {flag}")
+
+def encrypt_record(dek: bytes, value) -> dict:
+    """Serialize `value` as compact JSON, compress it and encrypt it into a binary record envelope."""
+    payload = json.dumps(value, separators=(",", ":"), ensure_ascii=False, default=str).encode()
+    flag, body = _compress(payload)
+    header = bytes([RECORD_FORMAT_VERSION, flag])
+    nonce, ciphertext = encrypt_aes_gcm(dek, body, header)
+    return {"record": Binary(header + nonce + ciphertext)}
+
+def decrypt_record(dek: bytes, entry: dict):
+    """Decrypt a stored record in either the binary envelope or the legacy base64 format."""
+    if "record" not in entry:
+        text = decrypt_patient_data(dek, entry["medical_data_nonce"], entry["encrypted_medical_data"])
+        try:
+            # Legacy records hold str(dict) rather than a real serialization.
+            return ast.literal_eval(text)
+        except (ValueError, SyntaxError):
+            return text
+
+    blob = bytes(entry["record"])
+    header, nonce, ciphertext = blob[:2], blob[2:14], blob[14:]
+    if header[0] != RECORD_FORMAT_VERSION:
+        raise ValueError(f"Unsupported record format version {header[0]}")
+    body = decrypt_aes_gcm(dek, nonce, ciphertext, header)
+    return json.loads(_decompress(header[1], body))
@@ -0,0 +1,60 @@
+"""CPU-bound half of the bulk import, executed in the import process pool.
+
+Kept free of MongoDB imports so spawned workers start quickly and never open connections.
+"""
+from app.core.security import get_password_hash
+from app.services.encryption_service import generate_patient_keys, unwrap_patient_dek, encrypt_record
+from app.services.blind_index import record_tokens
+from app.core.config import BLIND_INDEX_ENABLED
+from bson import ObjectId
+from datetime import datetime, timedelta
+import hashlib
+
+REQUIRED_FIELDS = ("email", "password", "cin")
+
+
+def record_id(job_id: str, line: int, index: int) -> ObjectId:
+    """Deterministic _id so a resumed import re-inserting a record hits a duplicate key instead of duplicating it."""
+    return ObjectId(hashlib.sha256(f"{job_id}:{line}:{index}".encode()).digest()[:12])
+
+
+def prepare_row(job_id: str, line: int, row: dict, existing_user: dict = None) -> dict:
+    """Hash the password, create (or, on resume, unwrap) the patient's DEK and encrypt its records."""
+    missing = [field for field in REQUIRED_FIELDS if not row.get(field)]
+    if missing:
+        raise ValueError(f"missing field(s): {', '.join(missing)}")
+    records = row.get("records") or []
+    if not isinstance(records, list):
+        raise ValueError("records must be a list")
+
+    email, cin = str(row["email"]), str(row["cin"])
+    user = patient = None
+    if existing_user is None:
+        envelope, dek = generate_patient_keys(cin)
+        user = {
+            "email": email,
+            "hashed_password": get_password_hash(str(row["password"])),
+            "role": "patient",
+            "cin": cin,
+            "is_active": True,
+            "import_job": job_id,
+            **envelope
+        }
+        patient = {"email": email, "cin": cin, "medical_history": {}, "import_job": job_id}
+    else:
+        dek = unwrap_patient_dek(cin, existing_user)
+
+    imported_at = datetime.utcnow()
+    record_docs = [
+        {
+            "_id": record_id(job_id, line, index),
+            "cin": cin,
+            # BSON dates keep milliseconds: a smaller step would collapse and leave the order to the hashed _id.
+            "created_at": imported_at + timedelta(milliseconds=index),
+            "created_by": "bulk_import",
+            **encrypt_record(dek, record),
+            **({"blind_index": record_tokens(record)} if BLIND_INDEX_ENABLED else {})
+        }
+        for index, record in enumerate(records)
+    ]
+    return {"line": line, "email": email, "cin": cin, "user": user, "patient": patient, "records": record_docs}
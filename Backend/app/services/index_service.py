@@ -0,0 +1,210 @@
+"""Declarative MongoDB indexes and query-plan diagnostics.
+
+INDEXES lists the index each router access pattern relies on; `ensure_indexes` creates
+them from the app lifespan (create_indexes is a no-op for indexes that already exist).
+QUERY_SHAPES mirrors the hot queries, and `explain_query_shapes` reports the winning plan
+of each one so a missing index shows up as a COLLSCAN, and an index that cannot provide
+the requested order as a blocking SORT.
+
+    python -m app.services.index_service            # create indexes
+    python -m app.services.index_service --explain  # create, then explain every query shape
+"""
+from app.services.mongo_service import get_database
+from app.core.config import (
+    LLM_CACHE_MONGO_ENABLED, LLM_CACHE_TTL_SECONDS, CLINICIAN_USAGE_TTL_SECONDS, BLIND_INDEX_ENABLED,
+    AUDIT_RETENTION_DAYS, ADMISSION_STORE,
+)
+from datetime import datetime
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import CollectionInvalid, OperationFailure
+from bson import ObjectId
+import argparse
+import logging
+
+logger = logging.getLogger(__name__)
+
+INDEXES = {
+    "users": [
+        # Also serves validate_doctor's {email, pending_validation} lookup.
+        IndexModel([("email", ASCENDING)], name="email_unique", unique=True),
+        IndexModel([("cin", ASCENDING)], name="cin"),
+    ],
+    "patients": [
+        IndexModel([("cin", ASCENDING)], name="cin_1", unique=True),
+    ],
+    "doctors": [
+        IndexModel([("email", ASCENDING)], name="email_unique", unique=True),
+    ],
+    "medical_records": [
+        # _id is the tiebreak of every history sort, so pages are read in index order (no SORT stage).
+        IndexModel([("cin", ASCENDING), ("created_at", ASCENDING), ("_id", ASCENDING)], name="cin_1_created_at_1__id_1"),
+    ],
+    "patient_summaries": [
+        IndexModel([("cin", ASCENDING)], name="cin_1", unique=True),
+    ],
+    "audit_events": [
+        IndexModel([("meta.actor_email", ASCENDING), ("timestamp", DESCENDING)], name="actor_timestamp"),
+        IndexModel([("patient_cin", ASCENDING), ("timestamp", DESCENDING)], name="patient_timestamp"),
+        IndexModel([("action", ASCENDING), ("timestamp", DESCENDING)], name="action_timestamp"),
+    ],
+    "clinician_usage": [
+        IndexModel([("updated_at", ASCENDING)], name="updated_at_ttl", expireAfterSeconds=CLINICIAN_USAGE_TTL_SECONDS),
+    ],
+}
+
+if ADMISSION_STORE == "mongo":
+    INDEXES["agent_admission"] = [
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+    ]
+
+if LLM_CACHE_MONGO_ENABLED:
+    INDEXES["llm_cache"] = [
+        IndexModel([("tags", ASCENDING)], name="tags_1"),
+        IndexModel([("created_at", ASCENDING)], name="created_at_1", expireAfterSeconds=LLM_CACHE_TTL_SECONDS),
+    ]
+
+# Indexes replaced by one of INDEXES, dropped once their replacement exists.
+SUPERSEDED_INDEXES = {
+    "medical_records": ["cin_1_created_at_1"],
+}
+
+# Time-series collections must exist before their indexes are created (create_indexes would
+# otherwise create a regular collection). Audit events are bucketed per actor.
+TIMESERIES = {
+    "audit_events": {
+        "timeseries": {"timeField": "timestamp", "metaField": "meta", "granularity": "seconds"},
+        "expire_after_seconds": AUDIT_RETENTION_DAYS * 86400 or None,
+    },
+}
+
+# (label, collection, filter, sort) for each hot query; the values are placeholders.
+QUERY_SHAPES = [
+    ("auth lookup", "users", {"email": "x@example.com"}, None),
+    ("key material", "users", {"cin": "X"}, None),
+    ("pending doctor", "users", {"email": "x@example.com", "pending_validation": True}, None),
+    ("bulk import users", "users", {"email": {"$in": ["x@example.com"]}}, None),
+    ("bulk import patients", "patients", {"cin": {"$in": ["X"]}}, None),
+    ("history page", "medical_records", {"cin": "X"}, [("created_at", ASCENDING), ("_id", ASCENDING)]),
+    ("summary delta", "medical_records", {"cin": "X", "$or": [
+        {"created_at": {"$gt": datetime(2000, 1, 1)}},
+        {"created_at": datetime(2000, 1, 1), "_id": {"$gt": ObjectId("0" * 24)}},
+    ]}, [("created_at", ASCENDING), ("_id", ASCENDING)]),
+    ("summary coverage", "medical_records", {"cin": "X", "$or": [
+        {"created_at": {"$lt": datetime(2000, 1, 1)}},
+        {"created_at": datetime(2000, 1, 1), "_id": {"$lte": ObjectId("0" * 24)}},
+    ]}, None),
+    ("rolling summary", "patient_summaries", {"cin": "X"}, None),
+    ("audit by patient", "audit_events", {"patient_cin": "X"}, [("timestamp", DESCENDING)]),
+    ("audit by actor", "audit_events", {"meta.actor_email": "x@example.com"}, [("timestamp", DESCENDING)]),
+]
+
+if BLIND_INDEX_ENABLED:
+    # The search matches one token on the index and returns the newest records first: created_at
+    # follows in the key so the order comes from the index instead of an in-memory sort.
+    INDEXES["medical_records"].append(IndexModel(
+        [("blind_index", ASCENDING), ("created_at", DESCENDING)], name="blind_index_1_created_at_-1",
+        partialFilterExpression={"blind_index": {"$exists": True}},
+    ))
+    SUPERSEDED_INDEXES["medical_records"].append("blind_index")
+    QUERY_SHAPES.append(("record search", "medical_records", {"blind_index": {"$all": ["0" * 32]}}, [("created_at", DESCENDING)]))
+
+
+def ensure_timeseries(database=None) -> list:
+    """Create the time-series collections and apply their retention; returns the ones that failed."""
+    database = database if database is not None else get_database()
+    existing = set(database.list_collection_names())
+    failed = []
+    for name, spec in TIMESERIES.items():
+        expire = spec["expire_after_seconds"]
+        try:
+            if name not in existing:
+                options = {"expireAfterSeconds": expire} if expire else {}
+                try:
+                    database.create_collection(name, timeseries=spec["timeseries"], **options)
+                    continue
+                except CollectionInvalid:
+                    pass  # created meanwhile by another worker
+            database.command("collMod", name, expireAfterSeconds=expire or "off")
+        except OperationFailure as exc:
+            logger.error("Could not set up time-series collection %s: %s", name, exc)
+            failed.append(name)
+    return failed
+
+
+def ensure_indexes(database=None) -> list:
+    """Create every declared index; returns the collections whose indexes could not be built."""
+    database = database if database is not None else get_database()
+    failed = ensure_timeseries(database)
+    for name, indexes in INDEXES.items():
+        if name in failed:
+            continue
+        try:
+            database[name].create_indexes(indexes)
+            existing = set(database[name].index_information())
+            for superseded in SUPERSEDED_INDEXES.get(name, []):
+                if superseded in existing:
+                    database[name].drop_index(superseded)
+        except OperationFailure as exc:
+            # Usually duplicate values under a new unique index: log and keep serving.
+            logger.error("Could not create indexes on %s: %s", name, exc)
+            failed.append(name)
+    return failed
+
+
+BLOCKING_SORT_STAGES = {"SORT", "SORT_KEY_GENERATOR"}
+
+
+def _stages(plan: dict) -> list:
+    stages = [plan.get("stage")]
+    for key in ("inputStage", "queryPlan"):
+        if key in plan:
+            stages += _stages(plan[key])
+    for child in plan.get("inputStages", []):
+        stages += _stages(child)
+    return [stage for stage in stages if stage]
+
+
+def explain_query_shapes(database=None) -> list:
+    """Winning plan stages of every registered query shape, with COLLSCANs and blocking SORTs flagged."""
+    database = database if database is not None else get_database()
+    report = []
+    for label, name, query, sort in QUERY_SHAPES:
+        cursor = database[name].find(query).limit(1)
+        if sort:
+            cursor = cursor.sort(sort)
+        plan = cursor.explain()["queryPlanner"]["winningPlan"]
+        stages = _stages(plan)
+        report.append({
+            "query": label,
+            "collection": name,
+            "stages": stages,
+            "collscan": "COLLSCAN" in stages,
+            # SORT_KEY_GENERATOR feeds a SORT on older servers; either means the index does not provide the order.
+            "blocking_sort": bool(BLOCKING_SORT_STAGES & set(stages)),
+        })
+    return report
+
+
+def log_collscans(database=None) -> list:
+    report = explain_query_shapes(database)
+    for entry in report:
+        plan = " <- ".join(entry["stages"])
+        if entry["collscan"]:
+            logger.warning("Query %r on %s is a COLLSCAN: %s", entry["query"], entry["collection"], plan)
+        if entry["blocking_sort"]:
+            logger.warning("Query %r on %s sorts in memory: %s", entry["query"], entry["collection"], plan)
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Create MediSync indexes and explain the hot query shapes.")
+    parser.add_argument("--explain", action="store_true", help="explain every registered query shape")
+    parser.add_argument("--skip-create", action="store_true", help="only run the diagnostics")
+    args = parser.parse_args()
+    if not args.skip_create:
+        failed = ensure_indexes()
+        print("Indexes created." if not failed else f"Index creation failed on: {', '.join(failed)}")
+    if args.explain:
+        for entry in explain_query_shapes():
+            flag = "COLLSCAN" if entry["collscan"] else "SORT" if entry["blocking_sort"] else "ok"
+            print(f"{flag:<9} {entry['query']:<22} {entry['collection']:<18} {' <- '.join(entry['stages'])}")
@@ -0,0 +1,90 @@
+from collections import OrderedDict
+import threading
+import time
+from app.core.config import DEK_CACHE_MAX_ENTRIES, DEK_CACHE_TTL_SECONDS
+
+
+class DEKCache:
+    """LRU + TTL cache of unwrapped patient DEKs, keyed by (cin, salt, encrypted_dek).
+
+    Keys are held in bytearrays so they can be zeroed when evicted or invalidated.
+    """
+
+    def __init__(self, max_entries: int = DEK_CACHE_MAX_ENTRIES, ttl_seconds: float = DEK_CACHE_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def _zeroize(buffer: bytearray):
+        for i in range(len(buffer)):
+            buffer[i] = 0
+
+    def _drop(self, key):
+        _, buffer = self._entries.pop(key)
+        self._zeroize(buffer)
+
+    def get(self, cin: str, salt: bytes, encrypted_dek: bytes):
+        key = (cin, salt, encrypted_dek)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, buffer = entry
+            if expires_at < time.monotonic():
+                self._drop(key)
+                self.evictions += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return bytes(buffer)
+
+    def put(self, cin: str, salt: bytes, encrypted_dek: bytes, dek: bytes):
+        if self.max_entries <= 0:
+            return
+        key = (cin, salt, encrypted_dek)
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, bytearray(dek))
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate(self, cin: str):
+        """Drop every cached DEK for a patient, e.g. after its DEK has been re-wrapped."""
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == cin]:
+                self._drop(key)
+                self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            for key in list(self._entries):
+                self._drop(key)
+                self.invalidations += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                # LRU and TTL evictions only; entries dropped on purpose count as invalidations.
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+dek_cache = DEKCache()
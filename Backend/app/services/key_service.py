@@ -0,0 +1,59 @@
+from app.services.mongo_service import users_collection
+from app.services.encryption_service import (
+    envelope_parts, derive_patient_dek, needs_rewrap, wrap_patient_dek, KEY_VERSION_PBKDF2
+)
+from app.services.key_cache import dek_cache
+from app.core.config import KEY_DERIVATION_WORKERS
+from app.core.metrics import stage_timer
+from concurrent.futures import ProcessPoolExecutor
+import asyncio
+import base64
+import multiprocessing
+
+_key_pool = None
+
+
+def _get_key_pool() -> ProcessPoolExecutor:
+    global _key_pool
+    if _key_pool is None:
+        _key_pool = ProcessPoolExecutor(max_workers=KEY_DERIVATION_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+    return _key_pool
+
+
+def shutdown_key_pool():
+    global _key_pool
+    if _key_pool is not None:
+        _key_pool.shutdown(wait=True)
+        _key_pool = None
+
+
+async def _unwrap_patient_dek(cin: str, patient: dict) -> bytes:
+    salt, version, wrapped = envelope_parts(patient)
+    dek = dek_cache.get(cin, salt, wrapped)
+    if dek is None:
+        if version == KEY_VERSION_PBKDF2:
+            # 100k PBKDF2 iterations: derived in the key pool, so concurrent misses run in parallel.
+            # The pool's own stage timings stay in the child, so the stage is timed from here.
+            loop = asyncio.get_running_loop()
+            with stage_timer("crypto.derive_kek"):
+                dek = await loop.run_in_executor(_get_key_pool(), derive_patient_dek, cin, patient)
+        else:
+            dek = derive_patient_dek(cin, patient)
+        dek_cache.put(cin, salt, wrapped, dek)
+    return dek
+
+
+async def get_patient_dek(cin: str, patient: dict) -> bytes:
+    """Unwrap the patient's DEK, lazily re-wrapping a legacy PBKDF2 envelope with the master key."""
+    dek = await _unwrap_patient_dek(cin, patient)
+    if needs_rewrap(patient):
+        envelope = wrap_patient_dek(cin, dek)
+        # Matching on the old wrapped DEK makes a concurrent re-wrap a no-op instead of a lost update.
+        result = await users_collection.update_one(
+            {"cin": cin, "encrypted_dek": patient["encrypted_dek"]},
+            {"$set": envelope, "$unset": {"encrypted_dek": "", "dek_nonce": ""}},
+        )
+        dek_cache.invalidate(cin)
+        if result.modified_count:
+            dek_cache.put(cin, base64.b64decode(envelope["salt"]), base64.b64decode(envelope["wrapped_dek"]), dek)
+    return dek
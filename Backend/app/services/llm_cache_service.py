@@ -0,0 +1,41 @@
+from agent.llm_cache import LLMCache
+from app.core.config import LLM_CACHE_MAX_ENTRIES, LLM_CACHE_MONGO_ENABLED, LLM_CACHE_KEY
+from app.services.crypto_utils import encrypt_aes_gcm, decrypt_aes_gcm
+from app.services.mongo_service import AsyncCollection
+from datetime import datetime
+
+
+class MongoLLMCacheStore:
+    """Second cache tier in Mongo; completions are stored AES-GCM encrypted under LLM_CACHE_KEY.
+
+    Its tags and TTL indexes are declared in index_service.
+    """
+
+    def __init__(self, collection: AsyncCollection, key: bytes):
+        self.collection = collection
+        self.key = key
+
+    def get(self, key: str):
+        doc = self.collection.sync.find_one({"_id": key})
+        if doc is None:
+            return None
+        value = decrypt_aes_gcm(self.key, doc["nonce"], doc["value"]).decode()
+        return value, doc.get("tags", [])
+
+    def set(self, key: str, value: str, tags: list):
+        nonce, ciphertext = encrypt_aes_gcm(self.key, value)
+        self.collection.sync.replace_one(
+            {"_id": key},
+            {"nonce": nonce, "value": ciphertext, "tags": tags, "created_at": datetime.utcnow()},
+            upsert=True,
+        )
+
+    def delete_tag(self, tag: str):
+        self.collection.sync.delete_many({"tags": tag})
+
+
+store = None
+if LLM_CACHE_MONGO_ENABLED and LLM_CACHE_KEY:
+    store = MongoLLMCacheStore(AsyncCollection("llm_cache"), bytes.fromhex(LLM_CACHE_KEY))
+
+llm_cache = LLMCache(max_entries=LLM_CACHE_MAX_ENTRIES, store=store)
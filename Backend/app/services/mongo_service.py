@@ -1,13 +1,168 @@
-from pymongo import MongoClient
-from app.core.config import MONGO_URI
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+import asyncio
+import logging
+import os
+from pymongo import MongoClient, ReadPreference, monitoring
+from app.core.config import (
+    MONGO_URI,
+    MONGO_DATABASE,
+    MONGO_MAX_POOL_SIZE,
+    MONGO_EXECUTOR_WORKERS,
+    MONGO_CONNECT_TIMEOUT_MS,
+    MONGO_SERVER_SELECTION_TIMEOUT_MS,
+    MONGO_SOCKET_TIMEOUT_MS,
+    MONGO_READ_PREFERENCE,
+    MONGO_SLOW_QUERY_MS,
+)
+from app.core.metrics import stage_timer
 from pymongo.server_api import ServerApi
 
-client = MongoClient(MONGO_URI, server_api=ServerApi('1'))
-db = client["MediSync"]
+_READ_PREFERENCES = {
+    "primary": ReadPreference.PRIMARY,
+    "primaryPreferred": ReadPreference.PRIMARY_PREFERRED,
+    "secondary": ReadPreference.SECONDARY,
+    "secondaryPreferred": ReadPreference.SECONDARY_PREFERRED,
+    "nearest": ReadPreference.NEAREST,
+}
 
-users_collection = db["users"]              
-patients_collection = db["patients"]         
-audit_logs_collection = db["audit_logs"]     
-doctors_collection = db["doctors"]
+logger = logging.getLogger(__name__)
 
-patients_collection.create_index("cin", unique=True)
+
+class SlowQueryListener(monitoring.CommandListener):
+    """Logs commands slower than `threshold_ms`: command name, collection and duration only, never the filter values."""
+
+    def __init__(self, threshold_ms: float):
+        self.threshold_ms = threshold_ms
+        self._commands = {}
+
+    def started(self, event):
+        collection = event.command.get(event.command_name)
+        self._commands[event.request_id] = collection if isinstance(collection, str) else None
+
+    def succeeded(self, event):
+        collection = self._commands.pop(event.request_id, None)
+        duration_ms = event.duration_micros / 1000
+        if duration_ms >= self.threshold_ms:
+            logger.warning("Slow MongoDB %s on %s: %.1f ms", event.command_name, collection, duration_ms)
+
+    def failed(self, event):
+        self._commands.pop(event.request_id, None)
+
+
+# MongoClient is not fork-safe, so it is created on first use in each worker process
+# (normally from the app lifespan) rather than at import, where a pre-forking server
+# would share it between workers.
+_client = None
+
+
+def get_client() -> MongoClient:
+    global _client
+    if _client is None:
+        _client = MongoClient(
+            MONGO_URI,
+            server_api=ServerApi('1'),
+            maxPoolSize=MONGO_MAX_POOL_SIZE,
+            connectTimeoutMS=MONGO_CONNECT_TIMEOUT_MS,
+            serverSelectionTimeoutMS=MONGO_SERVER_SELECTION_TIMEOUT_MS,
+            socketTimeoutMS=MONGO_SOCKET_TIMEOUT_MS,
+            event_listeners=[SlowQueryListener(MONGO_SLOW_QUERY_MS)] if MONGO_SLOW_QUERY_MS > 0 else [],
+        )
+    return _client
+
+
+def get_database():
+    return get_client().get_database(MONGO_DATABASE, read_preference=_READ_PREFERENCES[MONGO_READ_PREFERENCE])
+
+
+def close_client():
+    global _client
+    if _client is not None:
+        _client.close()
+        _client = None
+
+
+def _forget_client_after_fork():
+    # The parent's sockets must not be reused; the child connects again on first use.
+    global _client
+    _client = None
+
+
+os.register_at_fork(after_in_child=_forget_client_after_fork)
+
+# pymongo is blocking, so every call made from a route runs on this bounded pool
+# instead of the event loop. Sized to the connection pool so threads never queue
+# on a socket.
+executor = ThreadPoolExecutor(max_workers=MONGO_EXECUTOR_WORKERS, thread_name_prefix="mongo")
+
+
+class AsyncCollection:
+    """Awaitable facade over a pymongo collection; the raw collection is exposed as `.sync`.
+
+    The collection is resolved by name against the current client on every access, so
+    module-level instances stay valid across client creation, shutdown and fork.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._override = None
+
+    @property
+    def sync(self):
+        return self._override if self._override is not None else get_database()[self.name]
+
+    @sync.setter
+    def sync(self, collection):
+        self._override = collection
+
+    async def _run(self, fn, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        # Timed on the loop side, so executor queueing counts towards the stage.
+        with stage_timer(f"mongo.{self.name}.{fn.__name__}"):
+            return await loop.run_in_executor(executor, partial(fn, *args, **kwargs))
+
+    async def find_one(self, *args, **kwargs):
+        return await self._run(self.sync.find_one, *args, **kwargs)
+
+    async def find(self, *args, **kwargs):
+        """Run a find and return the materialized list of documents."""
+        def find():
+            return list(self.sync.find(*args, **kwargs))
+        return await self._run(find)
+
+    async def insert_one(self, *args, **kwargs):
+        return await self._run(self.sync.insert_one, *args, **kwargs)
+
+    async def insert_many(self, *args, **kwargs):
+        return await self._run(self.sync.insert_many, *args, **kwargs)
+
+    async def update_one(self, *args, **kwargs):
+        return await self._run(self.sync.update_one, *args, **kwargs)
+
+    async def find_one_and_update(self, *args, **kwargs):
+        return await self._run(self.sync.find_one_and_update, *args, **kwargs)
+
+    async def update_many(self, *args, **kwargs):
+        return await self._run(self.sync.update_many, *args, **kwargs)
+
+    async def delete_many(self, *args, **kwargs):
+        return await self._run(self.sync.delete_many, *args, **kwargs)
+
+    async def count_documents(self, *args, **kwargs):
+        return await self._run(self.sync.count_documents, *args, **kwargs)
+
+    async def aggregate(self, pipeline, **kwargs):
+        def aggregate():
+            return list(self.sync.aggregate(pipeline, **kwargs))
+        return await self._run(aggregate)
+
+    async def bulk_write(self, *args, **kwargs):
+        return await self._run(self.sync.bulk_write, *args, **kwargs)
+
+
+users_collection = AsyncCollection("users")
+patients_collection = AsyncCollection("patients")
+# Time-series collection, created with its retention policy by index_service.
+audit_events_collection = AsyncCollection("audit_events")
+doctors_collection = AsyncCollection("doctors")
+medical_records_collection = AsyncCollection("medical_records")
@@ -0,0 +1,65 @@
+"""Projection-restricted queries for the routers.
+
+Each helper fetches only the fields its use case reads, so a login or a duplicate-email
+check never pulls a patient's key material or records out of MongoDB.
+"""
+from app.services.mongo_service import users_collection, medical_records_collection
+from app.services.encryption_service import KEY_MATERIAL_PROJECTION, RECORD_PROJECTION
+from pymongo import ASCENDING, DESCENDING
+from typing import Optional
+
+AUTH_PROJECTION = {"email": 1, "hashed_password": 1, "role": 1, "is_active": 1}
+EXISTS_PROJECTION = {"_id": 1}
+
+
+async def get_auth_user(email: str) -> Optional[dict]:
+    """_id, email, hashed_password, role and is_active of the account, for login."""
+    return await users_collection.find_one({"email": email}, AUTH_PROJECTION)
+
+
+async def email_exists(email: str) -> bool:
+    return await users_collection.find_one({"email": email}, EXISTS_PROJECTION) is not None
+
+
+async def get_pending_doctor(email: str) -> Optional[dict]:
+    return await users_collection.find_one({"email": email, "pending_validation": True}, EXISTS_PROJECTION)
+
+
+async def set_password_hash(user_id, hashed_password: str):
+    await users_collection.update_one({"_id": user_id}, {"$set": {"hashed_password": hashed_password}})
+
+
+async def get_key_material(cin: str) -> Optional[dict]:
+    """The patient's wrapped DEK envelope, as expected by get_patient_dek."""
+    return await users_collection.find_one({"cin": cin}, KEY_MATERIAL_PROJECTION)
+
+
+async def get_key_material_many(cins: list) -> list:
+    """Key material of several patients in one query, each with its `cin`."""
+    return await users_collection.find({"cin": {"$in": cins}}, dict(KEY_MATERIAL_PROJECTION, cin=1))
+
+
+async def get_history_page(cin: str, offset: int, limit: int, newest_first: bool = False) -> list:
+    """Encrypted record payloads only, ordered by (created_at, _id)."""
+    direction = DESCENDING if newest_first else ASCENDING
+    return await medical_records_collection.find(
+        {"cin": cin},
+        RECORD_PROJECTION,
+        sort=[("created_at", direction), ("_id", direction)],
+        skip=offset,
+        limit=limit,
+    )
+
+
+async def count_history(cin: str) -> int:
+    return await medical_records_collection.count_documents({"cin": cin})
+
+
+async def search_records(tokens: list, limit: int) -> list:
+    """Records carrying every blind-index token, newest first (served by the blind_index_1_created_at_-1 index)."""
+    return await medical_records_collection.find(
+        {"blind_index": {"$all": tokens}},
+        dict(RECORD_PROJECTION, _id=1, cin=1, created_at=1),
+        sort=[("created_at", DESCENDING)],
+        limit=limit,
+    )
@@ -0,0 +1,115 @@
+from app.services.mongo_service import AsyncCollection, medical_records_collection
+from app.services.encryption_service import encrypt_record, decrypt_record, RECORD_PROJECTION
+from app.services.agent_service import aget_agent
+from app.services.admission_service import admission
+from app.core.config import AGENT_ENABLED
+from agent.admission import LOW
+from datetime import datetime
+import asyncio
+import logging
+import weakref
+
+logger = logging.getLogger(__name__)
+
+patient_summaries_collection = AsyncCollection("patient_summaries")
+
+# Entries disappear once no coroutine holds or waits on the lock, so the map stays bounded
+# by the patients being summarized right now.
+_locks = weakref.WeakValueDictionary()
+
+
+def _lock_for(cin: str) -> asyncio.Lock:
+    lock = _locks.get(cin)
+    if lock is None:
+        lock = _locks[cin] = asyncio.Lock()
+    return lock
+
+
+def _after(cin: str, summary: dict) -> dict:
+    """Filter for the records appended after the ones already folded into `summary`."""
+    if not summary:
+        return {"cin": cin}
+    last_at, last_id = summary["last_record_at"], summary["last_record_id"]
+    return {"cin": cin, "$or": [
+        {"created_at": {"$gt": last_at}},
+        {"created_at": last_at, "_id": {"$gt": last_id}},
+    ]}
+
+
+def _through(cin: str, last_at: datetime, last_id) -> dict:
+    """Filter for the records up to and including the one at (last_at, last_id)."""
+    return {"cin": cin, "$or": [
+        {"created_at": {"$lt": last_at}},
+        {"created_at": last_at, "_id": {"$lte": last_id}},
+    ]}
+
+
+async def get_rolling_summary(cin: str, dek: bytes) -> str:
+    """Return the patient's rolling summary, folding in any records added since it was last updated.
+
+    The summary is stored encrypted under the patient's DEK in `patient_summaries`, together
+    with the (created_at, _id) of the last record it covers and the number of records it
+    covers, so each update only sends the new records to the model.
+
+    `created_at` is stamped before the insert is queued, so a record may commit after a later
+    stamped one has already moved the watermark past it. Such a record shows up as one more
+    record up to the watermark than the summary covers, and the summary is then rebuilt.
+    """
+    async with _lock_for(cin):
+        stored = await patient_summaries_collection.find_one({"cin": cin})
+        summary = None
+        if stored:
+            summary = decrypt_record(dek, stored["encrypted_summary"])
+
+        projection = dict(RECORD_PROJECTION, _id=1, created_at=1)
+        sort = [("created_at", 1), ("_id", 1)]
+        new_entries = await medical_records_collection.find(_after(cin, stored), projection, sort=sort)
+        if new_entries:
+            last_at, last_id = new_entries[-1]["created_at"], new_entries[-1]["_id"]
+        elif stored:
+            last_at, last_id = stored["last_record_at"], stored["last_record_id"]
+        else:
+            return summary
+
+        covered = (stored or {}).get("record_count", 0)
+        # Counted after the read, so a record committed meanwhile behind the watermark is seen too.
+        through = await medical_records_collection.count_documents(_through(cin, last_at, last_id))
+        if covered + len(new_entries) < through:
+            logger.warning("Rolling summary missed a record committed out of order; rebuilding it")
+            summary, covered = None, 0
+            new_entries = await medical_records_collection.find({"cin": cin}, projection, sort=sort)
+        if not new_entries:
+            return summary
+
+        new_records = [decrypt_record(dek, entry) for entry in new_entries]
+        agent = await aget_agent()
+        summary = await agent.update_summary(summary, new_records)
+
+        await patient_summaries_collection.update_one(
+            {"cin": cin},
+            {"$set": {
+                "encrypted_summary": encrypt_record(dek, summary),
+                "record_count": covered + len(new_entries),
+                "last_record_at": new_entries[-1]["created_at"],
+                "last_record_id": new_entries[-1]["_id"],
+                "updated_at": datetime.utcnow(),
+            }},
+            upsert=True,
+        )
+        return summary
+
+
+async def refresh_summary(cin: str, dek: bytes, clinician: str = None):
+    """Background hook run after records are appended; a no-op on workers without the agent.
+
+    The model call is charged to `clinician` at low priority; when it is refused, the records
+    are folded in by the next summary read instead.
+    """
+    if not AGENT_ENABLED:
+        return
+    if not (await admission.admit(clinician, LOW))["admitted"]:
+        return
+    try:
+        await get_rolling_summary(cin, dek)
+    except Exception:
+        logger.exception("Rolling summary refresh failed for a patient")
@@ -0,0 +1,33 @@
+from app.services.mongo_service import AsyncCollection
+from datetime import datetime
+from pymongo import ReturnDocument
+
+clinician_usage_collection = AsyncCollection("clinician_usage")
+
+
+class MongoUsageStore:
+    """Per-clinician request counters shared by every worker process.
+
+    Documents expire CLINICIAN_USAGE_TTL_SECONDS after the clinician's last request
+    (TTL index in index_service), which resets the count.
+    """
+
+    def __init__(self, collection: AsyncCollection = clinician_usage_collection):
+        self.collection = collection
+
+    async def record(self, clinician: str, break_interval: float) -> dict:
+        now = datetime.utcnow()
+        usage = await self.collection.find_one_and_update(
+            {"_id": clinician},
+            {"$inc": {"count": 1}, "$set": {"updated_at": now}, "$setOnInsert": {"last_break_at": now}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+        break_due = False
+        if (now - usage["last_break_at"]).total_seconds() > break_interval:
+            # Conditional on the value read, so only one worker reports the reminder.
+            result = await self.collection.update_one(
+                {"_id": clinician, "last_break_at": usage["last_break_at"]}, {"$set": {"last_break_at": now}}
+            )
+            break_due = result.modified_count == 1
+        return {"count": usage["count"], "break_due": break_due}
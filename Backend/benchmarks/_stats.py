@@ -0,0 +1,27 @@
+import math
+
+
+def percentile(samples, pct: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = max(0, math.ceil(pct / 100 * len(ordered)) - 1)
+    return ordered[rank]
+
+
+def summarize(latencies, elapsed: float) -> dict:
+    """Throughput and latency percentiles (milliseconds) for a list of per-request latencies in seconds."""
+    return {
+        "requests": len(latencies),
+        "throughput_rps": len(latencies) / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+    }
+
+
+def format_row(label: str, stats: dict) -> str:
+    return (
+        f"{label:<28} {stats['requests']:>7} req  {stats['throughput_rps']:>9.1f} req/s  "
+        f"p50 {stats['p50_ms']:>8.2f} ms  p95 {stats['p95_ms']:>8.2f} ms  p99 {stats['p99_ms']:>8.2f} ms"
+    )
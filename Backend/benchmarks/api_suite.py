@@ -0,0 +1,243 @@
+"""End-to-end benchmark of the API hot paths, compared against a stored baseline.
+
+Seeds a throwaway database with `--patients` synthetic patients of `--history` records
+each, swaps LlamaInstance for the fake chat model (configurable latency and token rate),
+then drives each scenario in process through the ASGI app at fixed concurrency:
+
+    login            POST /auth/login                                (bcrypt verify)
+    history_update   PATCH /doctor/update_patient_history/{cin}      (encrypt + insert)
+    history_read     GET /doctor/doctor/get_patient_history/{cin}    (DEK + page decrypt)
+    agent_describe   GET /agent/describe_patient/{cin}               (rolling summary + LLM)
+    agent_recommend  GET /agent/recommend_patient/{cin}
+    agent_batch      POST /agent/describe_patients                   (`--batch-size` patients)
+
+Results can be saved as the baseline and later runs compared against it; the run fails
+when a scenario's throughput drops, or its p95 grows, by more than `--tolerance`.
+
+    python -m benchmarks.api_suite --save benchmarks/results/baseline.json
+    python -m benchmarks.api_suite --baseline benchmarks/results/baseline.json
+
+Every patient of an agent_batch request is summarized at once, bounded only by the LLM
+gateway. When agent_batch runs, one batch is then timed alone against the slowest of its
+patients summarized alone. The run fails if the batch takes more than ceil(batch size /
+LLM_MAX_CONCURRENCY) times that, plus `--tolerance`. For a batch no larger than the
+gateway, that is the slowest single summary.
+
+The history_update latency includes the rolling-summary refresh, which runs as a
+background task inside the same ASGI call. Requires a reachable MongoDB at MONGO_URI
+(a local mongod is enough); the agent scenarios also need langchain installed.
+"""
+import os
+
+os.environ.setdefault("MONGO_DATABASE", "MediSyncBench")
+os.environ.setdefault("JWT_SECRET_KEY", "benchmark-only-secret")
+os.environ.setdefault("AGENT_WARMUP", "false")
+# One synthetic doctor drives every scenario: admission budgets would turn the load into 429s.
+for budget in ("CLINICIAN_REQUESTS", "CLINICIAN_TOKENS", "GLOBAL_REQUESTS", "GLOBAL_TOKENS", "BURNOUT_REQUESTS"):
+    os.environ.setdefault(f"ADMISSION_{budget}", "0")
+
+import argparse
+import asyncio
+import json
+import math
+import random
+import sys
+import time
+import httpx
+from datetime import datetime, timedelta
+from agent.fake_llm import FakeChatModel
+from app.core.config import LLM_MAX_CONCURRENCY
+from app.core.security import get_password_hash
+from app.main import app
+from app.services import agent_service, summary_service
+from app.services.encryption_service import generate_patient_keys, encrypt_record
+from app.services.mongo_service import get_database
+from benchmarks._stats import summarize, format_row
+
+SCENARIOS = ("login", "history_update", "history_read", "agent_describe", "agent_recommend", "agent_batch")
+DOCTOR_EMAIL = "doctor@bench.local"
+DOCTOR_PASSWORD = "bench-password"
+
+
+def synthetic_record(rng: random.Random, index: int) -> dict:
+    return {
+        "visit": index,
+        "date": f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+        "diagnosis": rng.choice(["hypertension artérielle", "diabète de type 2", "asthme", "migraine", "lombalgie"]),
+        "treatment": rng.choice(["amlodipine 5 mg", "metformine 850 mg", "salbutamol", "paracétamol 1 g", "kinésithérapie"]),
+        "notes": " ".join(rng.choice(["stable", "amélioration", "à surveiller", "bilan sanguin", "contrôle"]) for _ in range(12)),
+    }
+
+
+def seed(patients: int, history: int, seed_value: int) -> list:
+    db = get_database()
+    db.client.drop_database(db.name)
+    rng = random.Random(seed_value)
+    db.users.insert_one({
+        "email": DOCTOR_EMAIL,
+        "hashed_password": get_password_hash(DOCTOR_PASSWORD),
+        "role": "doctor",
+        "is_active": True,
+    })
+    # Real datetimes, as the app stores: the summary delta compares created_at with one.
+    base = datetime.utcnow() - timedelta(days=1)
+    cins = []
+    for p in range(patients):
+        cin = f"BENCH{p:06d}"
+        envelope, dek = generate_patient_keys(cin)
+        db.users.insert_one({"email": f"{cin.lower()}@bench.local", "role": "patient", "cin": cin, "is_active": True, **envelope})
+        db.patients.insert_one({"email": f"{cin.lower()}@bench.local", "cin": cin})
+        if history:
+            db.medical_records.insert_many([
+                {
+                    "cin": cin,
+                    "created_at": base + timedelta(milliseconds=i),
+                    "created_by": "bench",
+                    **encrypt_record(dek, synthetic_record(rng, i)),
+                }
+                for i in range(history)
+            ])
+        cins.append(cin)
+    return cins
+
+
+def use_fake_llm(latency: float, tokens_per_second: float, llm_cache: bool):
+    import agent.ClinicalAssistant
+    agent.ClinicalAssistant.LlamaInstance = lambda: FakeChatModel(latency=latency, tokens_per_second=tokens_per_second)
+    assistant = agent_service.get_agent()
+    if not llm_cache:
+        assistant.cache = None
+
+
+def request_for(scenario: str, cins: list, rng: random.Random, headers: dict, batch_size: int) -> dict:
+    if scenario == "agent_batch":
+        batch = rng.sample(cins, min(batch_size, len(cins)))
+        return {"method": "POST", "url": "/agent/describe_patients", "json": {"cins": batch}, "headers": headers}
+    cin = rng.choice(cins)
+    if scenario == "login":
+        return {"method": "POST", "url": "/auth/login", "data": {"username": DOCTOR_EMAIL, "password": DOCTOR_PASSWORD}}
+    if scenario == "history_update":
+        return {"method": "PATCH", "url": f"/doctor/update_patient_history/{cin}", "json": synthetic_record(rng, -1), "headers": headers}
+    if scenario == "history_read":
+        return {"method": "GET", "url": f"/doctor/doctor/get_patient_history/{cin}", "headers": headers}
+    if scenario == "agent_describe":
+        return {"method": "GET", "url": f"/agent/describe_patient/{cin}", "headers": headers}
+    return {"method": "GET", "url": f"/agent/recommend_patient/{cin}", "headers": headers}
+
+
+async def run_scenario(client, scenario: str, cins: list, headers: dict, args) -> dict:
+    latencies, errors = [], 0
+    stop_at = time.perf_counter() + args.duration
+
+    async def worker(worker_id: int):
+        nonlocal errors
+        rng = random.Random(args.seed * 1000 + worker_id)
+        while time.perf_counter() < stop_at:
+            request = request_for(scenario, cins, rng, headers, args.batch_size)
+            started = time.perf_counter()
+            response = await client.request(**request)
+            latencies.append(time.perf_counter() - started)
+            if response.status_code >= 400:
+                errors += 1
+            elif scenario == "agent_batch" and json.loads(response.text.splitlines()[-1])["failed"]:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*[worker(i) for i in range(args.concurrency)])
+    stats = summarize(latencies, time.perf_counter() - started)
+    stats["errors"] = errors
+    return stats
+
+
+async def check_batch_target(client, cins: list, headers: dict, args) -> bool:
+    """Time one batch alone against the slowest of its patients summarized alone."""
+    batch = random.Random(args.seed).sample(cins, min(args.batch_size, len(cins)))
+    slowest = 0.0
+    for cin in batch:
+        started = time.perf_counter()
+        await client.get(f"/agent/describe_patient/{cin}", headers=headers)
+        slowest = max(slowest, time.perf_counter() - started)
+    started = time.perf_counter()
+    response = await client.post("/agent/describe_patients", json={"cins": batch}, headers=headers)
+    elapsed = time.perf_counter() - started
+    target = slowest * math.ceil(len(batch) / LLM_MAX_CONCURRENCY)
+    ok = response.status_code == 200 and elapsed <= target * (1 + args.tolerance)
+    print(f"batch of {len(batch)} alone: {elapsed * 1000:.0f} ms, slowest single summary {slowest * 1000:.0f} ms, "
+          f"target {target * 1000:.0f} ms  {'ok' if ok else 'TOO SLOW'}")
+    return ok
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> bool:
+    ok = True
+    for scenario, stats in results.items():
+        previous = baseline.get("results", {}).get(scenario)
+        if not previous:
+            continue
+        rps_delta = stats["throughput_rps"] / previous["throughput_rps"] - 1 if previous["throughput_rps"] else 0.0
+        p95_delta = stats["p95_ms"] / previous["p95_ms"] - 1 if previous["p95_ms"] else 0.0
+        regressed = rps_delta < -tolerance or p95_delta > tolerance
+        ok = ok and not regressed
+        print(f"{scenario:<28} throughput {rps_delta:>+7.1%}  p95 {p95_delta:>+7.1%}  {'REGRESSION' if regressed else 'ok'}")
+    return ok
+
+
+async def main(args) -> bool:
+    cins = await asyncio.to_thread(seed, args.patients, args.history, args.seed)
+    results = {}
+    async with app.router.lifespan_context(app):
+        if args.skip_agent:
+            scenarios = [s for s in args.scenarios if not s.startswith("agent_")]
+            summary_service.AGENT_ENABLED = False  # history updates must not reach a real model
+        else:
+            scenarios = args.scenarios
+            use_fake_llm(args.llm_latency, args.llm_tokens_per_second, args.llm_cache)
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+            login = await client.post("/auth/login", data={"username": DOCTOR_EMAIL, "password": DOCTOR_PASSWORD})
+            headers = {"Authorization": f"Bearer {login.json()['access_token']}"}
+            for scenario in scenarios:
+                stats = await run_scenario(client, scenario, cins, headers, args)
+                results[scenario] = stats
+                print(format_row(scenario, stats) + f"  errors {stats['errors']}")
+            batch_ok = "agent_batch" not in scenarios or await check_batch_target(client, cins, headers, args)
+
+    report = {
+        "config": {key: value for key, value in vars(args).items() if key not in ("save", "baseline")},
+        "results": results,
+    }
+    if args.save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save)), exist_ok=True)
+        with open(args.save, "w") as target:
+            json.dump(report, target, indent=2)
+        print(f"Saved to {args.save}")
+    ok = batch_ok and all(stats["errors"] == 0 for stats in results.values())
+    if args.baseline:
+        with open(args.baseline) as source:
+            baseline = json.load(source)
+        if baseline.get("config") != report["config"]:
+            print("warning: baseline was recorded with a different configuration")
+        ok = compare(results, baseline, args.tolerance) and ok
+    if not args.keep_data:
+        db = get_database()
+        db.client.drop_database(db.name)
+    return ok
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--skip-agent", action="store_true", help="skip the agent scenarios (no langchain needed)")
+    parser.add_argument("--patients", type=int, default=100)
+    parser.add_argument("--history", type=int, default=50, help="records per synthetic patient")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--batch-size", type=int, default=20, help="patients per agent_batch request")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per scenario")
+    parser.add_argument("--llm-latency", type=float, default=0.3)
+    parser.add_argument("--llm-tokens-per-second", type=float, default=200.0)
+    parser.add_argument("--llm-cache", action="store_true", help="keep the LLM response cache enabled")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--save", help="write the results (e.g. as the new baseline) to this JSON file")
+    parser.add_argument("--baseline", help="compare against a results file written with --save")
+    parser.add_argument("--tolerance", type=float, default=0.10)
+    parser.add_argument("--keep-data", action="store_true")
+    sys.exit(0 if asyncio.run(main(parser.parse_args())) else 1)
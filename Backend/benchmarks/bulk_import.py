@@ -0,0 +1,99 @@
+"""Bulk import throughput, and a replayed (resumed) job that must not fail any row.
+
+Writes `--patients` synthetic NDJSON rows of `--records` records each, imports them into a
+throwaway database, then rewinds the job to line 0 and runs it again, as a resume after
+a crash before the progress was committed would. The replay must unwrap every envelope
+the first run wrote (master-key envelopes under the default `--wrapping-mode master`),
+import nothing twice and report no failed row.
+
+    python -m benchmarks.bulk_import --patients 2000 --records 5
+
+Requires a reachable MongoDB at MONGO_URI (a local mongod is enough).
+"""
+import argparse
+import os
+import sys
+import tempfile
+
+
+def _configure(args):
+    # Read by app.core.config at import time, and inherited by the spawned import workers.
+    os.environ.setdefault("MONGO_DATABASE", "MediSyncBench")
+    os.environ["KEY_WRAPPING_MODE"] = args.wrapping_mode
+    if args.wrapping_mode == "master" and not os.getenv("MASTER_KEY_FILE"):
+        key_file = tempfile.NamedTemporaryFile("w", suffix=".key", delete=False)
+        key_file.write(os.urandom(32).hex())
+        key_file.close()
+        os.environ["MASTER_KEY_FILE"] = key_file.name
+
+
+def write_rows(path: str, patients: int, records: int):
+    import json
+    with open(path, "w", encoding="utf-8") as target:
+        for p in range(patients):
+            cin = f"IMPORT{p:06d}"
+            target.write(json.dumps({
+                "email": f"{cin.lower()}@bench.local",
+                "password": "bench-password",
+                "cin": cin,
+                "records": [{"visit": i, "diagnosis": "hypertension artérielle", "treatment": "amlodipine 5 mg"}
+                            for i in range(records)],
+            }, ensure_ascii=False) + "\n")
+
+
+async def run(args) -> bool:
+    import time
+    from app.services.bulk_import import create_job, run_import, import_jobs_collection, shutdown_import_pool
+    from app.services.mongo_service import get_database, close_client
+
+    db = get_database()
+    db.client.drop_database(db.name)
+    with tempfile.TemporaryDirectory() as workdir:
+        path = os.path.join(workdir, "patients.ndjson")
+        write_rows(path, args.patients, args.records)
+        job_id = await create_job(path, "ndjson")
+        try:
+            started = time.perf_counter()
+            job = await run_import(job_id, args.batch_size)
+            elapsed = time.perf_counter() - started
+            print(f"import   {job['imported']:>7} rows in {elapsed:7.2f} s  {job['imported'] / elapsed:>9.1f} rows/s  failed {job['failed']}")
+
+            await import_jobs_collection.update_one(
+                {"_id": job_id}, {"$set": {"last_line": 0, "processed": 0, "imported": 0, "failed": 0, "errors": []}}
+            )
+            started = time.perf_counter()
+            replay = await run_import(job_id, args.batch_size)
+            elapsed = time.perf_counter() - started
+            print(f"resume   {replay['imported']:>7} rows in {elapsed:7.2f} s  {replay['imported'] / elapsed:>9.1f} rows/s  failed {replay['failed']}")
+            errors = (await import_jobs_collection.find_one({"_id": job_id}, {"errors": {"$slice": 5}}))["errors"]
+            for error in errors:
+                print(f"  line {error['line']}: {error['error']}")
+        finally:
+            shutdown_import_pool()
+
+    records = db.medical_records.count_documents({})
+    users = db.users.count_documents({})
+    print(f"stored   {users} users, {records} records")
+    ok = (
+        job["failed"] == 0 and replay["failed"] == 0
+        and users == args.patients and records == args.patients * args.records
+    )
+    if not args.keep_data:
+        db.client.drop_database(db.name)
+    close_client()
+    return ok
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--patients", type=int, default=2000)
+    parser.add_argument("--records", type=int, default=5, help="records per patient")
+    parser.add_argument("--batch-size", type=int, default=200)
+    parser.add_argument("--wrapping-mode", choices=("pbkdf2", "master"), default="master")
+    parser.add_argument("--keep-data", action="store_true")
+    args = parser.parse_args()
+    _configure(args)
+    import asyncio
+    ok = asyncio.run(run(args))
+    print("OK" if ok else "FAILED")
+    sys.exit(0 if ok else 1)
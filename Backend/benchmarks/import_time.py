@@ -0,0 +1,72 @@
+"""Cold-start cost of `import app.main`, with and without the agent subsystem.
+
+Each sample is a fresh interpreter that imports the app and reports its wall time,
+peak RSS, module count and whether LangChain/OpenAI were loaded. With the agent lazily
+initialized, neither AGENT_ENABLED=true nor false should load them at import; the
+one-off cost moves to the agent load (`--load-agent`), which the app does in the
+background after startup.
+
+    python -m benchmarks.import_time --repeat 5 --load-agent
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+PROBE = r"""
+import json, resource, sys, time
+started = time.perf_counter()
+import app.main
+imported = time.perf_counter() - started
+result = {
+    "import_s": imported,
+    "modules": len(sys.modules),
+    "langchain_loaded": any(name.split(".")[0] in ("langchain", "langchain_openai", "openai") for name in sys.modules),
+}
+if sys.argv[1] == "1":
+    from app.services.agent_service import get_agent
+    started = time.perf_counter()
+    try:
+        get_agent()
+        result["agent_load_s"] = time.perf_counter() - started
+    except Exception as exc:
+        result["agent_load_error"] = repr(exc)
+result["max_rss_mb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+print(json.dumps(result))
+"""
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def sample(agent_enabled: bool, load_agent: bool) -> dict:
+    env = dict(os.environ, AGENT_ENABLED=str(agent_enabled).lower(), PYTHONDONTWRITEBYTECODE="1")
+    output = subprocess.run(
+        [sys.executable, "-c", PROBE, "1" if load_agent else "0"],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main(args):
+    for agent_enabled in (False, True):
+        samples = [sample(agent_enabled, args.load_agent and agent_enabled) for _ in range(args.repeat)]
+        line = (
+            f"AGENT_ENABLED={str(agent_enabled).lower():<5}  "
+            f"import {statistics.median(s['import_s'] for s in samples) * 1000:>8.1f} ms  "
+            f"rss {statistics.median(s['max_rss_mb'] for s in samples):>7.1f} MB  "
+            f"modules {samples[0]['modules']:>5}  langchain loaded at import: {samples[0]['langchain_loaded']}"
+        )
+        if "agent_load_s" in samples[0]:
+            line += f"  agent load {statistics.median(s['agent_load_s'] for s in samples) * 1000:.1f} ms"
+        elif "agent_load_error" in samples[0]:
+            line += f"  agent load failed: {samples[0]['agent_load_error']}"
+        print(line)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--load-agent", action="store_true", help="also time the first get_agent() call")
+    main(parser.parse_args())
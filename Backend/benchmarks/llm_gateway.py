@@ -0,0 +1,44 @@
+"""Exercise the LLM gateway against the fake chat model.
+
+Fires `--requests` concurrent completions, of which `--distinct` have unique prompts,
+and reports wall time, provider calls actually made (coalescing) and queue waits
+(concurrency limit).
+
+    python -m benchmarks.llm_gateway --requests 100 --distinct 10 --max-concurrency 4
+"""
+import argparse
+import asyncio
+import time
+from agent.fake_llm import FakeChatModel
+from agent.llm_gateway import LLMGateway
+from benchmarks._stats import summarize, format_row
+
+
+async def main(args):
+    llm = FakeChatModel(latency=args.latency, tokens_per_second=args.tokens_per_second)
+    gateway = LLMGateway(llm, max_concurrency=args.max_concurrency)
+    latencies = []
+
+    async def one(i: int):
+        started = time.perf_counter()
+        await gateway.invoke(f"patient-{i % args.distinct}")
+        latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*[one(i) for i in range(args.requests)])
+    elapsed = time.perf_counter() - started
+
+    print(format_row("gateway.invoke", summarize(latencies, elapsed)))
+    print(f"provider calls: {llm.calls} for {args.requests} requests")
+    for name, value in gateway.stats().items():
+        print(f"  {name}: {value}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--distinct", type=int, default=10)
+    parser.add_argument("--max-concurrency", type=int, default=4)
+    parser.add_argument("--latency", type=float, default=0.3)
+    parser.add_argument("--tokens-per-second", type=float, default=200.0)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,59 @@
+"""Per-request cost of MetricsMiddleware and the stage timers.
+
+Drives an in-process FastAPI app (no MongoDB) whose endpoint runs a few timed stages,
+with the middleware off, on, and on with Server-Timing, and reports the latency delta.
+
+    python -m benchmarks.metrics_overhead --requests 20000
+"""
+import argparse
+import asyncio
+import time
+import httpx
+from fastapi import FastAPI
+from app.core import metrics
+from app.core.metrics import MetricsMiddleware, stage_timer
+from benchmarks._stats import summarize, format_row
+
+
+def build_app(middleware: bool) -> FastAPI:
+    app = FastAPI()
+    if middleware:
+        app.add_middleware(MetricsMiddleware)
+
+    @app.get("/patients/{cin}")
+    async def endpoint(cin: str):
+        for stage in ("mongo.users.find_one", "crypto.unwrap_key", "crypto.decrypt_aes_gcm"):
+            with stage_timer(stage):
+                pass
+        return {"cin": cin}
+    return app
+
+
+async def run(app: FastAPI, requests: int, concurrency: int) -> dict:
+    latencies = []
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def worker(count):
+            for i in range(count):
+                started = time.perf_counter()
+                await client.get(f"/patients/P{i}")
+                latencies.append(time.perf_counter() - started)
+        started = time.perf_counter()
+        await asyncio.gather(*[worker(requests // concurrency) for _ in range(concurrency)])
+        elapsed = time.perf_counter() - started
+    return summarize(latencies, elapsed)
+
+
+async def main(args):
+    cases = [("no middleware", False, False), ("metrics", True, False), ("metrics + Server-Timing", True, True)]
+    for label, middleware, server_timing in cases:
+        metrics.SERVER_TIMING_ENABLED = server_timing
+        await run(build_app(middleware), min(args.requests, 1000), args.concurrency)  # warm-up
+        print(format_row(label, await run(build_app(middleware), args.requests, args.concurrency)))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,87 @@
+"""Load test: event-loop latency while MongoDB responses are artificially slowed.
+
+Drives `/auth/login` (one `users.find_one`) at fixed concurrency while a probe
+hits `/` in parallel. With the executor-backed data layer the probe's p99 stays
+flat as Mongo slows down; with `--mode blocking` (pymongo called on the loop,
+as before) it grows with the injected delay.
+
+    python -m benchmarks.mongo_latency --delays 0 50 200 --concurrency 32
+
+Requires a reachable MongoDB at MONGO_URI (a local mongod is enough).
+"""
+import argparse
+import asyncio
+import time
+import httpx
+from app.main import app
+from app.services import mongo_service
+from app.services.mongo_service import AsyncCollection, users_collection
+from benchmarks._stats import summarize, format_row
+
+
+class SlowCollection:
+    """Delegates to a real pymongo collection after sleeping `delay` seconds per call."""
+
+    def __init__(self, collection, delay: float):
+        self._collection = collection
+        self._delay = delay
+
+    def __getattr__(self, name):
+        target = getattr(self._collection, name)
+        if not callable(target):
+            return target
+
+        def slowed(*args, **kwargs):
+            time.sleep(self._delay)
+            return target(*args, **kwargs)
+        return slowed
+
+
+async def _blocking_run(self, fn, *args, **kwargs):
+    return fn(*args, **kwargs)
+
+
+async def _drive(client, path, method, data, stop_at, latencies):
+    while time.perf_counter() < stop_at:
+        started = time.perf_counter()
+        await client.request(method, path, data=data)
+        latencies.append(time.perf_counter() - started)
+
+
+async def run_once(delay_ms: float, concurrency: int, duration: float):
+    real = users_collection.sync
+    users_collection.sync = SlowCollection(real, delay_ms / 1000)
+    try:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            stop_at = time.perf_counter() + duration
+            login, probe = [], []
+            form = {"username": "nobody@bench.local", "password": "x"}
+            started = time.perf_counter()
+            await asyncio.gather(
+                _drive(client, "/", "GET", None, stop_at, probe),
+                *[_drive(client, "/auth/login", "POST", form, stop_at, login) for _ in range(concurrency)],
+            )
+            elapsed = time.perf_counter() - started
+        return summarize(login, elapsed), summarize(probe, elapsed)
+    finally:
+        users_collection.sync = None
+
+
+async def main(args):
+    if args.mode == "blocking":
+        AsyncCollection._run = _blocking_run
+    print(f"mode={args.mode} concurrency={args.concurrency} executor_workers={mongo_service.executor._max_workers}")
+    for delay in args.delays:
+        login, probe = await run_once(delay, args.concurrency, args.duration)
+        print(format_row(f"login   delay={delay:g}ms", login))
+        print(format_row(f"probe   delay={delay:g}ms", probe))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mode", choices=["executor", "blocking"], default="executor")
+    parser.add_argument("--delays", type=float, nargs="+", default=[0, 50, 200])
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=10.0)
+    asyncio.run(main(parser.parse_args()))
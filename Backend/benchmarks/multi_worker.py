@@ -0,0 +1,163 @@
+"""Multi-worker scaling and correctness check for the gunicorn deployment mode.
+
+For each worker count, starts `gunicorn -c gunicorn.conf.py app.main:app` against a
+throwaway database, drives the doctor history endpoint at fixed concurrency and checks:
+every response is a 200 with the seeded records, and one audit entry was written per
+request (each worker's audit writer drains on shutdown). Throughput is reported with its
+scaling efficiency relative to one worker. A second check increments one shared admission
+window bucket and one clinician usage counter from several processes and verifies no
+increment is lost.
+
+    JWT_SECRET_KEY=bench python -m benchmarks.multi_worker --workers 1 2 4 --concurrency 64
+
+Requires a reachable MongoDB at MONGO_URI (a local mongod is enough) and gunicorn.
+"""
+import os
+
+os.environ.setdefault("MONGO_DATABASE", "MediSyncBench")
+
+import argparse
+import asyncio
+import multiprocessing
+import signal
+import subprocess
+import sys
+import time
+import httpx
+from datetime import datetime, timedelta
+from app.core.security import create_access_token
+from app.services.encryption_service import generate_patient_keys, encrypt_record
+from app.services.mongo_service import get_database, close_client
+from benchmarks._stats import summarize, format_row
+
+CIN = "BENCH0001"
+RECORDS = [{"visit": i, "diagnosis": "contrôle tension artérielle", "treatment": "amlodipine 5 mg"} for i in range(20)]
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def seed():
+    db = get_database()
+    db.client.drop_database(db.name)
+    envelope, dek = generate_patient_keys(CIN)
+    base = datetime.utcnow() - timedelta(days=1)
+    db.users.insert_one({"email": "patient@bench.local", "role": "patient", "cin": CIN, "is_active": True, **envelope})
+    db.medical_records.insert_many([
+        {"cin": CIN, "created_at": base + timedelta(milliseconds=i), "created_by": "bench", **encrypt_record(dek, record)}
+        for i, record in enumerate(RECORDS)
+    ])
+
+
+def start_server(workers: int, port: int) -> subprocess.Popen:
+    env = dict(os.environ, WEB_CONCURRENCY=str(workers), BIND=f"127.0.0.1:{port}")
+    return subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "app.main:app"],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+
+
+async def wait_ready(client: httpx.AsyncClient, timeout: float = 30.0):
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        try:
+            if (await client.get("/")).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.2)
+    raise RuntimeError("server did not start")
+
+
+async def _drive(client, path, headers, stop_at, latencies, failures):
+    while time.perf_counter() < stop_at:
+        started = time.perf_counter()
+        response = await client.get(path, headers=headers)
+        latencies.append(time.perf_counter() - started)
+        if response.status_code != 200 or response.json()["medical_history"] != RECORDS:
+            failures.append(response.status_code)
+
+
+async def run_workers(workers: int, concurrency: int, duration: float, port: int):
+    doctor = f"doctor-{workers}w@bench.local"
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': doctor, 'role': 'doctor'})}"}
+    path = f"/doctor/doctor/get_patient_history/{CIN}?limit={len(RECORDS)}"
+    server = start_server(workers, port)
+    try:
+        limits = httpx.Limits(max_connections=concurrency)
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=30) as client:
+            await wait_ready(client)
+            await client.get(path, headers=headers)  # warm every code path once
+            latencies, failures = [], []
+            stop_at = time.perf_counter() + duration
+            started = time.perf_counter()
+            await asyncio.gather(*[_drive(client, path, headers, stop_at, latencies, failures) for _ in range(concurrency)])
+            elapsed = time.perf_counter() - started
+    finally:
+        server.send_signal(signal.SIGTERM)
+        server.wait(timeout=60)
+    audited = get_database().audit_events.count_documents({"meta.actor_email": doctor})
+    return summarize(latencies, elapsed), len(failures), audited - 1  # minus the warm-up request
+
+
+USAGE_CLINICIAN = "usage@bench.local"
+USAGE_BUCKET = f"clinician:{USAGE_CLINICIAN}|60|0"
+
+
+def _count_usage(calls: int):
+    from app.services.admission_service import MongoWindowStore
+    from app.services.usage_service import MongoUsageStore
+
+    async def hammer():
+        window, usage = MongoWindowStore(), MongoUsageStore()
+        for _ in range(calls):
+            await window.add({USAGE_BUCKET: time.time() + 3600}, requests=1)
+            await usage.record(USAGE_CLINICIAN, 3600)
+    asyncio.run(hammer())
+
+
+def check_usage_counter(processes: int, calls: int) -> bool:
+    context = multiprocessing.get_context("spawn")
+    workers = [context.Process(target=_count_usage, args=(calls,)) for _ in range(processes)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    db = get_database()
+    count = db.agent_admission.find_one({"_id": USAGE_BUCKET})["requests"]
+    usage = db.clinician_usage.find_one({"_id": USAGE_CLINICIAN})["count"]
+    print(f"admission counter: {count} / {processes * calls} increments from {processes} processes")
+    print(f"usage counter: {usage} / {processes * calls} increments from {processes} processes")
+    return count == usage == processes * calls
+
+
+def main(args):
+    if not os.getenv("JWT_SECRET_KEY"):
+        raise SystemExit("Set JWT_SECRET_KEY so the benchmark and the workers share a signing key.")
+    seed()
+    ok = True
+    baseline = None
+    try:
+        for workers in args.workers:
+            stats, failures, audited = asyncio.run(run_workers(workers, args.concurrency, args.duration, args.port))
+            baseline = baseline or stats["throughput_rps"] / workers
+            efficiency = stats["throughput_rps"] / (baseline * workers)
+            audit_ok = audited == stats["requests"]
+            ok = ok and not failures and audit_ok
+            print(format_row(f"workers={workers}", stats)
+                  + f"  scaling {efficiency:>5.0%}  failures {failures}  audit {audited}/{stats['requests']}")
+        ok = check_usage_counter(max(args.workers), args.usage_calls) and ok
+    finally:
+        db = get_database()
+        db.client.drop_database(db.name)
+        close_client()
+    print("OK" if ok else "FAILED")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--usage-calls", type=int, default=200)
+    main(parser.parse_args())
@@ -0,0 +1,45 @@
+"""Login throughput (bcrypt verification) as a function of the password pool size.
+
+    python -m benchmarks.password_hash --pool-sizes 1 2 4 8 --logins 64
+"""
+import argparse
+import asyncio
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from app.core import security
+from benchmarks._stats import summarize, format_row
+
+
+async def run(pool_size: int, logins: int, hashed: str):
+    pool = ProcessPoolExecutor(max_workers=pool_size, mp_context=multiprocessing.get_context("spawn"))
+    security._password_pool = pool
+    try:
+        await security.check_password("warm-up", hashed)
+        latencies = []
+
+        async def login():
+            started = time.perf_counter()
+            valid, _ = await security.check_password("correct horse", hashed)
+            assert valid
+            latencies.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        await asyncio.gather(*[login() for _ in range(logins)])
+        return summarize(latencies, time.perf_counter() - started)
+    finally:
+        security.shutdown_password_pool()
+
+
+async def main(args):
+    hashed = security.get_password_hash("correct horse")
+    print(f"bcrypt rounds={security.BCRYPT_ROUNDS}")
+    for size in args.pool_sizes:
+        print(format_row(f"pool_size={size}", await run(size, args.logins, hashed)))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pool-sizes", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--logins", type=int, default=64)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,187 @@
+"""Bytes transferred per query shape and per endpoint, with the repository projections.
+
+Seeds a throwaway database with one patient account carrying key material and a legacy
+embedded `medical_history`, plus `--records` encrypted records that also carry bulky
+fields no endpoint reads (`created_by`, blind-index tokens). Reply sizes are measured on
+the wire with a CommandListener registered for every client, the app's included.
+
+First, each query shape is run twice, unprojected and with the projection from
+`app.services.repository`, to show what the projections save. Then the real endpoints are
+driven in process through the ASGI app, and the bytes of every read their handlers issue
+are checked against the endpoint's budget. That budget depends only on what the endpoint
+returns (never on the legacy history or the unrelated fields), so a route that stops
+using the repository or its projection goes over it. The script exits non-zero when an
+endpoint is over budget.
+
+    python -m benchmarks.query_bytes --records 200 --history 200
+
+Requires a reachable MongoDB at MONGO_URI (a local mongod is enough).
+"""
+import os
+
+os.environ.setdefault("MONGO_DATABASE", "MediSyncBench")
+os.environ.setdefault("JWT_SECRET_KEY", "benchmark-only-secret")
+os.environ.setdefault("AGENT_ENABLED", "false")
+
+import argparse
+import asyncio
+import sys
+import bson
+import httpx
+from datetime import datetime, timedelta
+from pymongo import monitoring
+from app.core.security import create_access_token, get_password_hash
+from app.main import app
+from app.services.encryption_service import generate_patient_keys, encrypt_record, KEY_MATERIAL_PROJECTION, RECORD_PROJECTION
+from app.services.key_service import shutdown_key_pool
+from app.services.mongo_service import get_database, close_client
+from app.services.repository import AUTH_PROJECTION, EXISTS_PROJECTION
+
+EMAIL = "patient@bench.local"
+PASSWORD = "bench-password"
+CIN = "BENCH0001"
+DOCTOR = "doctor@bench.local"
+PAGE_SIZE = 50
+HISTORY_SORT = [("created_at", 1), ("_id", 1)]
+READ_COMMANDS = {"find", "getMore", "aggregate", "count", "distinct"}
+
+
+class ReplySizes(monitoring.CommandListener):
+    def __init__(self):
+        self.total = 0
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        if event.command_name in READ_COMMANDS:
+            self.total += len(bson.encode(event.reply))
+
+    def failed(self, event):
+        pass
+
+
+# Registered for every client, so the app's own MongoClient (created on first use) is measured too.
+listener = ReplySizes()
+monitoring.register(listener)
+
+
+def _legacy_entry(size: int) -> dict:
+    return {"encrypted_medical_data": os.urandom(size).hex(), "medical_data_nonce": os.urandom(12).hex()}
+
+
+def seed(db, records: int, history: int, record_size: int) -> int:
+    """Seed the patient; returns the largest stored record envelope, in BSON bytes."""
+    db.client.drop_database(db.name)
+    envelope, dek = generate_patient_keys(CIN)
+    db.users.insert_one({
+        "email": EMAIL,
+        "hashed_password": get_password_hash(PASSWORD),
+        "role": "patient",
+        "cin": CIN,
+        "is_active": True,
+        **envelope,
+        "medical_history": [_legacy_entry(record_size) for _ in range(history)],
+    })
+    base = datetime.utcnow() - timedelta(days=1)
+    encrypted = [encrypt_record(dek, {"visit": i, "notes": os.urandom(record_size // 2).hex()}) for i in range(records)]
+    db.medical_records.insert_many([
+        {
+            "cin": CIN,
+            "created_at": base + timedelta(milliseconds=i),
+            "created_by": DOCTOR,
+            **entry,
+            "blind_index": [os.urandom(16).hex() for _ in range(64)],
+        }
+        for i, entry in enumerate(encrypted)
+    ])
+    return max(len(bson.encode(entry)) for entry in encrypted)
+
+
+def shapes(db):
+    """(label, unprojected query, projected query) for each repository use case."""
+    users, records = db.users, db.medical_records
+    return [
+        ("auth lookup",
+         lambda: users.find_one({"email": EMAIL}),
+         lambda: users.find_one({"email": EMAIL}, AUTH_PROJECTION)),
+        ("existence check",
+         lambda: users.find_one({"email": EMAIL}),
+         lambda: users.find_one({"email": EMAIL}, EXISTS_PROJECTION)),
+        ("key material",
+         lambda: users.find_one({"cin": CIN}),
+         lambda: users.find_one({"cin": CIN}, KEY_MATERIAL_PROJECTION)),
+        ("history page",
+         lambda: list(records.find({"cin": CIN}).sort(HISTORY_SORT).limit(PAGE_SIZE)),
+         lambda: list(records.find({"cin": CIN}, RECORD_PROJECTION).sort(HISTORY_SORT).limit(PAGE_SIZE))),
+    ]
+
+
+def endpoints(record_bytes: int) -> list:
+    """(endpoint, request, expected status, byte budget for the replies of its reads)."""
+    # Reply envelope (cursor id, namespace, ok, $clusterTime on replica sets) plus a short document.
+    small_reply = 1024
+    doctor = {"Authorization": f"Bearer {create_access_token({'sub': DOCTOR, 'role': 'doctor'})}"}
+    return [
+        ("POST /auth/login",
+         {"method": "POST", "url": "/auth/login", "data": {"username": EMAIL, "password": PASSWORD}},
+         200, small_reply),
+        # An already registered email, so the existence check has a document to (not) return.
+        ("POST /auth/register_patient",
+         {"method": "POST", "url": "/auth/register_patient", "json": {"email": EMAIL, "password": PASSWORD, "cin": CIN}},
+         400, small_reply),
+        # Key material, the page and the total count; each record is its envelope plus BSON framing.
+        ("GET /doctor/doctor/get_patient_history/{cin}",
+         {"method": "GET", "url": f"/doctor/doctor/get_patient_history/{CIN}", "params": {"limit": PAGE_SIZE},
+          "headers": doctor},
+         200, 3 * small_reply + PAGE_SIZE * (record_bytes + 16)),
+    ]
+
+
+def measure(query) -> int:
+    listener.total = 0
+    query()
+    return listener.total
+
+
+async def check_endpoints(record_bytes: int) -> bool:
+    ok = True
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+            for endpoint, request, status, budget in endpoints(record_bytes):
+                listener.total = 0
+                response = await client.request(**request)
+                used = listener.total
+                within = response.status_code == status and used <= budget
+                ok = ok and within
+                verdict = "ok" if within else (f"HTTP {response.status_code}" if response.status_code != status else "OVER BUDGET")
+                print(f"{endpoint:<46} {used:>10} B / {budget:>10} B  {verdict}")
+    return ok
+
+
+def main(args):
+    db = get_database()
+    record_bytes = seed(db, args.records, args.history, args.record_size)
+    try:
+        print(f"{'query':<20} {'unprojected':>12} {'projected':>12} {'saved':>7}")
+        for label, full, projected in shapes(db):
+            before, after = measure(full), measure(projected)
+            print(f"{label:<20} {before:>10} B {after:>10} B {100 * (1 - after / before):>6.1f}%")
+        print()
+        ok = asyncio.run(check_endpoints(record_bytes))
+    finally:
+        shutdown_key_pool()
+        db = get_database()
+        db.client.drop_database(db.name)
+        close_client()
+    print("OK" if ok else "FAILED")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--records", type=int, default=200)
+    parser.add_argument("--history", type=int, default=200, help="legacy embedded entries on the user document")
+    parser.add_argument("--record-size", type=int, default=512)
+    main(parser.parse_args())
@@ -0,0 +1,30 @@
+"""Multi-worker launch: gunicorn -c gunicorn.conf.py app.main:app
+
+Each worker runs the app lifespan, which creates its own MongoDB client, audit writer and
+(on first use) agent, and closes them on shutdown. Nothing holding sockets or threads is
+created at import, so preloading the app in the master before forking is safe.
+
+MONGO_MAX_POOL_SIZE and LLM_MAX_CONCURRENCY apply per worker: size them so that
+workers x pool stays within the server's connection and rate limits. With more than one
+worker, admission counters default to the MongoDB store so every budget is shared.
+"""
+import multiprocessing
+import os
+
+bind = os.getenv("BIND", "0.0.0.0:8000")
+workers = int(os.getenv("WEB_CONCURRENCY", str(multiprocessing.cpu_count())))
+if workers > 1:
+    # Set before the app is imported (in the master when preloading, else in each worker).
+    os.environ.setdefault("ADMISSION_STORE", "mongo")
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = os.getenv("GUNICORN_PRELOAD", "true").lower() == "true"
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", "30"))
+keepalive = 5
+
+
+def child_exit(server, worker):
+    # With PROMETHEUS_MULTIPROC_DIR set, /metrics aggregates every worker; drop the dead one's live gauges.
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,71 @@
+"""Copy the legacy `audit_logs` collection into the `audit_events` time-series collection.
+
+Normalizes both historical shapes (user_email/target_cin and doctor_email/patient_cin)
+and ISO-string timestamps into the audit_events schema. Events keep their original _id
+and are only copied once, so an interrupted run can simply be re-run; `audit_logs` is
+left in place for the operator to drop once the copy has been checked.
+
+    python -m migrations.audit_logs_to_timeseries --batch-size 1000
+"""
+import argparse
+from datetime import datetime
+from pymongo import ASCENDING
+from pymongo.errors import BulkWriteError
+from app.services.index_service import ensure_indexes
+from app.services.mongo_service import get_database
+
+DUPLICATE_KEY = 11000
+
+
+def normalize(log: dict) -> dict:
+    timestamp = log.get("timestamp")
+    if isinstance(timestamp, str):
+        timestamp = datetime.fromisoformat(timestamp)
+    elif timestamp is None:
+        timestamp = log["_id"].generation_time.replace(tzinfo=None)
+    return {
+        "_id": log["_id"],
+        "timestamp": timestamp,
+        "meta": {
+            "actor_email": log.get("user_email") or log.get("doctor_email"),
+            "actor_role": log.get("user_role") or log.get("role"),
+        },
+        "action": log.get("action"),
+        "patient_cin": log.get("target_cin") or log.get("patient_cin"),
+        "details": log.get("details", ""),
+        "ip_address": log.get("ip_address"),
+        "hostname": log.get("hostname"),
+    }
+
+
+def run(batch_size: int):
+    db = get_database()
+    ensure_indexes(db)
+    legacy, events = db["audit_logs"], db["audit_events"]
+    last_id, copied = None, 0
+    while True:
+        query = {"_id": {"$gt": last_id}} if last_id else {}
+        batch = list(legacy.find(query).sort("_id", ASCENDING).limit(batch_size))
+        if not batch:
+            break
+        # Time-series collections have no unique _id index, so skip what an earlier run copied.
+        ids = [log["_id"] for log in batch]
+        done = {event["_id"] for event in events.find({"_id": {"$in": ids}}, {"_id": 1})}
+        pending = [normalize(log) for log in batch if log["_id"] not in done]
+        if pending:
+            try:
+                copied += len(events.insert_many(pending, ordered=False).inserted_ids)
+            except BulkWriteError as exc:
+                copied += exc.details.get("nInserted", 0)
+                if any(error.get("code") != DUPLICATE_KEY for error in exc.details.get("writeErrors", [])):
+                    raise
+        last_id = batch[-1]["_id"]
+        print(f"{copied} audit events copied")
+    print("Done.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+    run(args.batch_size)
@@ -0,0 +1,52 @@
+"""Add blind-index tokens to medical records written before BLIND_INDEX_ENABLED was turned on.
+
+Decrypts each patient's untokenized records with the patient's DEK and stores their tokens;
+records are only updated while they still have no `blind_index`, so it is safe to re-run.
+
+    BLIND_INDEX_ENABLED=true BLIND_INDEX_KEY_FILE=/etc/medisync/index.key \
+        python -m migrations.build_blind_index --batch-size 500
+"""
+import argparse
+from pymongo import ASCENDING, UpdateOne
+from app.core.config import BLIND_INDEX_ENABLED
+from app.services.blind_index import load_index_key, record_tokens
+from app.services.encryption_service import unwrap_patient_dek, decrypt_record, KEY_MATERIAL_PROJECTION, RECORD_PROJECTION
+from app.services.mongo_service import users_collection, medical_records_collection
+
+
+def run(batch_size: int):
+    if not BLIND_INDEX_ENABLED:
+        raise SystemExit("Set BLIND_INDEX_ENABLED=true before building the blind index.")
+    key = load_index_key()
+
+    records = medical_records_collection.sync
+    query = {"blind_index": {"$exists": False}}
+    projection = dict(RECORD_PROJECTION, _id=1, cin=1)
+    deks, last_id, indexed = {}, None, 0
+    while True:
+        batch_query = dict(query, **({"_id": {"$gt": last_id}} if last_id else {}))
+        batch = list(records.find(batch_query, projection).sort("_id", ASCENDING).limit(batch_size))
+        if not batch:
+            break
+        operations = []
+        for entry in batch:
+            cin = entry["cin"]
+            if cin not in deks:
+                patient = users_collection.sync.find_one({"cin": cin, "salt": {"$exists": True}}, KEY_MATERIAL_PROJECTION)
+                deks[cin] = unwrap_patient_dek(cin, patient) if patient else None
+            if deks[cin] is None:
+                continue
+            tokens = record_tokens(decrypt_record(deks[cin], entry), key)
+            operations.append(UpdateOne({"_id": entry["_id"], "blind_index": {"$exists": False}}, {"$set": {"blind_index": tokens}}))
+        if operations:
+            indexed += records.bulk_write(operations, ordered=False).modified_count
+        last_id = batch[-1]["_id"]
+        print(f"{indexed} records indexed")
+    print("Done.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+    run(args.batch_size)
@@ -0,0 +1,76 @@
+"""Move embedded `users.medical_history` arrays into the `medical_records` collection.
+
+Resumable: every record is upserted on (cin, legacy_index), and a user's array is only
+unset once all of its records are in place, so an interrupted run can simply be re-run.
+
+    python -m migrations.embedded_history_to_records --batch-size 200
+"""
+import argparse
+from datetime import timedelta
+from pymongo import ASCENDING, UpdateOne
+from app.services.mongo_service import users_collection, medical_records_collection
+
+
+def migrate_user(user: dict) -> int:
+    records = medical_records_collection.sync
+    history = user["medical_history"]
+    # The original append time was never stored; registration time keeps legacy
+    # records ordered before anything appended after the migration. Offsets are in
+    # milliseconds, the precision of BSON dates, so the array order survives.
+    base_time = user["_id"].generation_time.replace(tzinfo=None)
+    operations = [
+        UpdateOne(
+            {"cin": user["cin"], "legacy_index": index},
+            {"$setOnInsert": {
+                "created_at": base_time + timedelta(milliseconds=index),
+                "encrypted_medical_data": entry["encrypted_medical_data"],
+                "medical_data_nonce": entry["medical_data_nonce"],
+            }},
+            upsert=True,
+        )
+        for index, entry in enumerate(history)
+    ]
+    records.bulk_write(operations, ordered=False)
+    # Only unset if nothing was pushed meanwhile; otherwise the next run picks it up.
+    users_collection.sync.update_one(
+        {"_id": user["_id"], "medical_history": {"$size": len(history)}},
+        {"$unset": {"medical_history": ""}},
+    )
+    return len(history)
+
+
+def run(batch_size: int, dry_run: bool = False):
+    medical_records_collection.sync.create_index(
+        [("cin", ASCENDING), ("legacy_index", ASCENDING)],
+        unique=True,
+        partialFilterExpression={"legacy_index": {"$exists": True}},
+    )
+    query = {"medical_history.0": {"$exists": True}, "cin": {"$exists": True}}
+    last_id = None
+    users, moved = 0, 0
+    while True:
+        batch_query = dict(query, **({"_id": {"$gt": last_id}} if last_id else {}))
+        batch = list(
+            users_collection.sync.find(batch_query, {"cin": 1, "medical_history": 1})
+            .sort("_id", ASCENDING)
+            .limit(batch_size)
+        )
+        if not batch:
+            break
+        for user in batch:
+            if dry_run:
+                moved += len(user["medical_history"])
+            else:
+                moved += migrate_user(user)
+            users += 1
+        last_id = batch[-1]["_id"]
+        print(f"{users} patients processed, {moved} records {'found' if dry_run else 'moved'}")
+    print("Done.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--batch-size", type=int, default=200)
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+    run(args.batch_size, args.dry_run)
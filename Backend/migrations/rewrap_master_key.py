@@ -0,0 +1,54 @@
+"""Re-wrap every remaining PBKDF2 (key_version 1) patient DEK with the server master key.
+
+Reads patients still on the legacy envelope in batches, spreads the PBKDF2 unwraps across a
+process pool and writes each new envelope only if the legacy one is still in place, so it is
+safe to run while the API lazily re-wraps on access, and to re-run after an interruption.
+
+    KEY_WRAPPING_MODE=master MASTER_KEY_FILE=/etc/medisync/master.key \
+        python -m migrations.rewrap_master_key --batch-size 500 --workers 8
+"""
+import argparse
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pymongo import ASCENDING, UpdateOne
+from app.core.config import KEY_WRAPPING_MODE
+from app.services.encryption_service import rewrap_legacy_envelope, load_master_key
+from app.services.mongo_service import users_collection
+
+
+def run(batch_size: int, workers: int):
+    if KEY_WRAPPING_MODE != "master":
+        raise SystemExit("Set KEY_WRAPPING_MODE=master before migrating envelopes.")
+    load_master_key()
+
+    users = users_collection.sync
+    query = {"key_version": {"$exists": False}, "encrypted_dek": {"$exists": True}, "cin": {"$exists": True}}
+    projection = {"cin": 1, "salt": 1, "encrypted_dek": 1, "dek_nonce": 1}
+    last_id, migrated = None, 0
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        while True:
+            batch_query = dict(query, **({"_id": {"$gt": last_id}} if last_id else {}))
+            batch = list(users.find(batch_query, projection).sort("_id", ASCENDING).limit(batch_size))
+            if not batch:
+                break
+            envelopes = pool.map(rewrap_legacy_envelope, [doc["cin"] for doc in batch], batch)
+            operations = [
+                UpdateOne(
+                    {"_id": doc["_id"], "encrypted_dek": doc["encrypted_dek"]},
+                    {"$set": envelope, "$unset": {"encrypted_dek": "", "dek_nonce": ""}},
+                )
+                for doc, envelope in zip(batch, envelopes)
+            ]
+            migrated += users.bulk_write(operations, ordered=False).modified_count
+            last_id = batch[-1]["_id"]
+            print(f"{migrated} envelopes re-wrapped")
+    print("Done.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+    run(args.batch_size, args.workers)